@@ -20,7 +20,8 @@ import sys
 import traceback
 import pandas as pd
 
-from hive.report.abfstats import ABFReporter
+from hive.report.abfstats import REPORT_COLUMNS, ABFReporter
+from hive.report.sinks import REPORT_FORMATS, CSVRowSink, resolve_format, write_report
 
 __all__ = []
 __version__ = 0.3
@@ -112,8 +113,42 @@ USAGE
         parser.add_argument('-r', '--recurse', dest='recurse', action='store_true', default=False,
                             help='search in subdirectories?')
 
+        parser.add_argument('-d', '--max-depth', dest='max_depth', type=int, default=None, metavar='N',
+                            help='search at most N levels of subdirectories with --recurse [default: no limit]')
+
+        parser.add_argument('-x', '--prune', dest='prune', type=str, action='append', default=None, metavar='PATTERN',
+                            help='do not search directories whose names match PATTERN (repeatable)')
+
         parser.add_argument('-o', '--output', dest='csv_file', type=str, nargs='?', default='abf-report.csv',
-                            help='output CSV file (default = "abf-report.csv"')
+                            help='output file, or dataset directory with --partition (default = "abf-report.csv"')
+
+        parser.add_argument('-f', '--format', dest='format', type=str, default=None, choices=REPORT_FORMATS,
+                            help='output format (parquet and feather are typed) [default: from the output extension]')
+
+        parser.add_argument('--partition', dest='partition', action='store_true', default=False,
+                            help='write a dataset directory partitioned by day (parquet/feather): only the days '
+                                 'of files read in this run are (re)written, so with --cache runs append new days. '
+                                 'NOTE: rows of deleted files are kept until the dataset is rewritten (--rewrite)')
+
+        parser.add_argument('--rewrite', dest='rewrite', action='store_true', default=False,
+                            help='with --partition, rewrite every day of the dataset (dropping deleted files)')
+
+        parser.add_argument('-j', '--jobs', type=int, dest='jobs', default=1, metavar='N',
+                            help='list directories and read file headers in N threads (0 = default thread count) '
+                                 '[default: 1]')
+
+        parser.add_argument('--cache', dest='cache_file', type=str, default=None, metavar='FILE',
+                            help='SQLite file caching report rows: only new or changed files are read '
+                                 '(keep it on a local disk) [default: no cache]')
+
+        parser.add_argument('--cache-max-age', dest='cache_max_age', type=float, default=None, metavar='DAYS',
+                            help='delete cached rows (of any reporter version) not used for DAYS days '
+                                 '[default: keep every entry]')
+
+        parser.add_argument('-s', '--stream', dest='stream', action='store_true', default=False,
+                            help='discard each file header once read; with CSV output, append rows to '
+                                 'OUTPUT.part as they are made, which replaces OUTPUT (sorted) when the '
+                                 'scan completes')
 
         # Process arguments
         args = parser.parse_args()
@@ -121,18 +156,63 @@ USAGE
         _input = args.file_or_dir
         _pattern = args.pattern
         _recurse = args.recurse
+        _max_depth = args.max_depth
+        _prune = args.prune
         _output = args.csv_file
+        _jobs = args.jobs
+        _cache_file = args.cache_file
+        _cache_max_age = None if args.cache_max_age is None else args.cache_max_age * 24 * 3600
+        _stream = args.stream
+        _format = resolve_format(_output, args.format)
+        _partition = args.partition
+        _rewrite = args.rewrite
+
+        if _jobs < 0:
+            raise CLIError(f'invalid number of jobs [{_jobs}]')
+
+        if _partition and _format == 'csv':
+            raise CLIError('--partition requires the parquet or feather format')
+
+        if _rewrite and not _partition:
+            raise CLIError('--rewrite requires --partition')
 
         __verbose__ = 1  # args.verbose
 
         converter = ABFReporter(
             input_path=_input,
             file_pattern=_pattern,
-            recurse=_recurse)
-
-        df: pd.DataFrame = converter.process().data_frame
-        df.to_csv(_output, float_format='%0.1f', index=False)
-        __log(f"*** DONE: wrote {df.shape[0]} lines to {_output}")
+            recurse=_recurse,
+            jobs=_jobs,
+            cache_file=_cache_file,
+            cache_max_age=_cache_max_age,
+            streaming=_stream,
+            max_depth=_max_depth,
+            prune=_prune)
+
+        # NOTE: streamed rows go to a partial file, so the output is only ever
+        # replaced (atomically) by the complete, sorted report
+        partial_output = None
+
+        if _stream and _format == 'csv':
+            partial_output = _output + '.part'
+
+            with CSVRowSink(partial_output, REPORT_COLUMNS) as sink:
+                converter.process(sink)
+        else:
+            converter.process()
+
+        df: pd.DataFrame = converter.data_frame
+        rows = write_report(
+            df,
+            _output if partial_output is None else partial_output,
+            _format,
+            partition=_partition,
+            dates=converter.updated_dates if _partition else None,
+            rewrite=_rewrite)
+
+        if partial_output is not None:
+            os.replace(partial_output, _output)
+        __log(f"*** DONE: wrote {rows} lines to {_output}")
 
     except KeyboardInterrupt:
         print('*** INTERRUPT ***')
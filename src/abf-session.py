@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+"""
+abf-session -- indexes converted ABF H5 files as one virtual session
+
+@author:     Jason White
+
+@copyright:  2019 FBRI. All rights reserved.
+
+@license:    AS IS
+
+@contact:    jas0nw@vtc.vt.edu
+@deffield    updated: 2026-10-17
+"""
+
+from argparse import ArgumentParser
+from argparse import RawDescriptionHelpFormatter
+import os
+import sys
+import traceback
+from pathlib import Path
+
+from hive.io.session import build_session_index
+
+__all__ = []
+__version__ = 0.1
+__date__ = '2026-10-17'
+__updated__ = '2026-10-17'
+__verbose__ = 0
+
+
+class CLIError(Exception):
+    """Generic exception to raise and log different fatal errors."""
+
+    def __init__(self, msg):
+        super(CLIError).__init__(type(self))
+        self.msg = f'error: {msg}'
+
+    def __str__(self):
+        return self.msg
+
+    def __unicode__(self):
+        return self.msg
+
+
+def __log(message, test=None):
+    global __verbose__
+
+    # default to logging when verbose
+    if test is None:
+        test = (__verbose__ > 0)
+
+    if test:
+        print(message, flush=True)
+
+
+def main(_argv=None):  # IGNORE:C0111
+    """Command line options."""
+    global __verbose__
+
+    if _argv is None:
+        # argv = sys.argv
+        pass
+    else:
+        sys.argv.extend(_argv)
+
+    program_name = os.path.basename(sys.argv[0])
+    program_version = 'v%s' % __version__
+    program_build_date = str(__updated__)
+    program_version_message = '%%(prog)s %s (%s)' % (program_version, program_build_date)
+    program_shortdesc = __import__('__main__').__doc__.split('\n')[1]
+    program_license = '''%s
+
+  Created by Jason White on %s.
+  Copyright 2019 FBRI. All rights reserved.
+
+  Licensed under the Apache License 2.0
+  http://www.apache.org/licenses/LICENSE-2.0
+
+  Distributed on an 'AS IS' basis without warranties
+  or conditions of any kind, either express or implied.
+
+USAGE
+''' % (program_shortdesc, str(__date__))
+
+    try:
+        # Setup argument parser
+        parser = ArgumentParser(description=program_license,
+                                formatter_class=RawDescriptionHelpFormatter)
+
+        parser.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
+                            help='increase verbosity level')
+
+        parser.add_argument('--version', action='version',
+                            version=program_version_message)
+
+        parser.add_argument('-o', '--output', type=str, dest='output', default='session.h5',
+                            help='output index file [default: session.h5]')
+
+        parser.add_argument('--overwrite', dest='overwrite', action='store_true',
+                            help='overwrite an existing index file')
+
+        parser.add_argument(dest='paths', type=str, nargs='+', metavar='FILE.h5',
+                            help='converted ABF file(s), or directories of them')
+
+        # Process arguments
+        args = parser.parse_args()
+
+        __verbose__ = args.verbose
+        output = args.output
+
+        if os.path.exists(output) and not args.overwrite:
+            raise CLIError(f'index file "{output}" exists: use --overwrite to replace it')
+
+        paths = []
+        for path in args.paths:
+            if os.path.isdir(path):
+                paths.extend(sorted(str(p) for p in Path(path).glob('*.h5')))
+            else:
+                paths.append(path)
+
+        # never index the index
+        paths = [p for p in paths if os.path.abspath(p) != os.path.abspath(output)]
+
+        if len(paths) == 0:
+            raise CLIError('no input files')
+
+        sweep_count = build_session_index(paths, output)
+        __log(f"*** DONE: indexed {sweep_count} sweeps from {len(paths)} files in {output}")
+
+    except KeyboardInterrupt:
+        print('*** INTERRUPT ***')
+        return 0
+
+    except CLIError as e:
+        indent = len(program_name) * ' '
+        sys.stderr.write(program_name + ': ' + e.msg + '\n')
+        sys.stderr.write(indent + '  for help use --help\n')
+        return 2
+
+    except Exception as e:
+        indent = len(program_name) * ' '
+        sys.stderr.write(program_name + ': ' + repr(e) + '\n')
+        traceback.print_exc()
+        sys.stderr.write(indent + '  for help use --help\n')
+        return 2
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
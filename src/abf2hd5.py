@@ -20,13 +20,16 @@ from argparse import ArgumentParser
 from argparse import RawDescriptionHelpFormatter
 from pathlib import Path
 
-from hive.convert.abf2h5 import ABFConverter
+from hive.convert.abf2h5 import ABFConverter, CHUNK_LAYOUTS
+from hive.convert.base import COMPRESSION_PRESETS
+from hive.convert.batch import process_all
+from hive.scan import expand_paths
 from hive.timer import Timer
 
 __all__ = []
 __version__ = 1.3
 __date__ = '2019-05-16'
-__updated__ = '2022-04-26'
+__updated__ = '2026-10-17'
 __verbose__ = 0
 
 
@@ -126,20 +129,61 @@ USAGE
         parser.add_argument('-c', '--channel', type=str, nargs='?', dest='channels', action='append', metavar="CHANNEL",
                             help='channel to convert: can be either number or ADC name [default: all]')
 
+        parser.add_argument('-b', '--block-size', type=int, dest='block_size', default=None, metavar='SWEEPS',
+                            help='stream data to disk SWEEPS sweeps at a time [default: read whole file]')
+
+        parser.add_argument('--raw', dest='store_raw', action='store_true',
+                            help='store raw int16 ADC counts with per-channel gain/offset attributes')
+
+        parser.add_argument('--chunks', type=str, dest='chunk_layout', default='auto', choices=CHUNK_LAYOUTS,
+                            help='HDF5 chunk layout of the output data, matched to how it will be read [default: auto]')
+
+        parser.add_argument('-t', '--threads', type=int, dest='compress_threads', default=None, metavar='N',
+                            help='compress output chunks in N threads (0 = one per CPU) [default: off]')
+
+        parser.add_argument('-z', '--compression', type=str, dest='compression', default=None,
+                            choices=list(COMPRESSION_PRESETS),
+                            help=f'compression preset [default: {ABFConverter.default_compression}]')
+
+        parser.add_argument('-j', '--jobs', type=int, dest='jobs', default=1, metavar='N',
+                            help='number of files to convert in parallel (0 = one per CPU) [default: 1]')
+
         parser.add_argument('--overwrite', dest='overwrite', action='store_true',
                             help='overwrite existing output file(s)')
 
+        parser.add_argument('-u', '--update', dest='update', action='store_true',
+                            help='only (re)convert files whose source or settings changed since the last conversion')
+
+        parser.add_argument('-r', '--recurse', dest='recurse', action='store_true', default=False,
+                            help='search subdirectories of directory paths')
+
         parser.add_argument(dest='paths', type=str, nargs='+', metavar='FILE.abf',
-                            help='paths to source file(s)')
+                            help='paths to source file(s) or directories (of *.abf files)')
 
         # Process arguments
         args = parser.parse_args()
 
-        paths = args.paths
+        recurse = args.recurse
         __verbose__ = args.verbose
         overwrite = args.overwrite
+        update = args.update
         output = args.output
+        jobs = args.jobs
         channels = args.channels
+        block_size = args.block_size
+        store_raw = args.store_raw
+        chunk_layout = args.chunk_layout
+        compress_threads = args.compress_threads
+        compression = args.compression
+
+        if jobs < 0:
+            raise CLIError(f'invalid number of jobs [{jobs}]')
+
+        # directories expand to their *.abf files (oldest first)
+        paths = expand_paths(args.paths, '*.abf', recurse, jobs=jobs)
+
+        if not paths:
+            raise CLIError(f'no *.abf files found in {args.paths}')
 
         if not __check_output_arg(paths, output):
             return 1
@@ -147,25 +191,58 @@ USAGE
         if overwrite:
             __log('Overwrite mode on')
 
+        converters = []
+
         for in_path in paths:
             converter = ABFConverter(
                 in_path,
                 output_file=output,
                 channel_select=channels,
-                verbose=(__verbose__ > 1))
+                verbose=(__verbose__ > 1),
+                block_size=block_size,
+                store_raw=store_raw,
+                chunk_layout=chunk_layout,
+                compress_threads=compress_threads,
+                compression=compression)
 
             src_file = Path(converter.input_file).name
             dst_file = Path(converter.output_file).name
 
-            if __check_output_file(paths, converter.output_file, overwrite):
+            if update:
+                if converter.is_up_to_date():
+                    __log(f'{src_file} -> *** UP TO DATE ***')
+                    continue
+            elif not __check_output_file(paths, converter.output_file, overwrite):
+                __log(f'{src_file} -> *** SKIP ***')
+                continue
+
+            if jobs == 1:
                 __log(f'{src_file} -> {dst_file}', (__verbose__ == 1))
                 with Timer(f'{src_file} -> {dst_file}', (__verbose__ > 1)):
                     converter.process()
             else:
-                __log(f'{src_file} -> *** SKIP ***')
+                converters.append(converter)
+
+        failures = 0
+
+        for result in process_all(converters, jobs):
+            src_file = Path(result.input_file).name
+            dst_file = Path(result.output_file).name
+
+            if result.error is None:
+                __log(f'{src_file} -> {dst_file}: {result.elapsed:.6f} seconds')
+            else:
+                failures += 1
+                sys.stderr.write(f'{src_file} -> *** FAILED ({result.elapsed:.6f} seconds) ***\n')
+                sys.stderr.write(result.error)
 
         if len(paths) > 1:
             __log('*** DONE ***')
+
+        if failures > 0:
+            sys.stderr.write(f'{program_name}: {failures} of {len(converters)} conversion(s) failed\n')
+            return 1
+
         return 0
 
     except KeyboardInterrupt:
@@ -1,5 +1,6 @@
 __all__ = [
     'base',
     'lvm2h5',
-    'abf2h5'
+    'abf2h5',
+    'batch'
 ]
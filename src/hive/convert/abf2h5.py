@@ -5,6 +5,7 @@ Created on May 15, 2019
 
 Converter for voltammetry ABF (Axon binary format) files
 """
+import os
 import shutil
 from datetime import datetime, time
 from pathlib import Path
@@ -14,13 +15,57 @@ import pyabf
 from dfply import *
 
 from hive.convert.base import FileConverter
+from hive.convert.chunks import CHUNK_TARGET_SIZE, ParallelChunkWriter
+from hive.io.abf import ABFMap
 from hive.timer import Timer
 
+# named /data chunk layouts (data is nSamples x nChannels x nSweeps)
+#   auto:              let h5py guess (the legacy layout)
+#   per-sweep:         one chunk per sweep per channel
+#   per-channel-block: one channel, a block of consecutive sweeps
+#   time-major:        all channels, a block of consecutive sweeps
+CHUNK_LAYOUTS = ['auto', 'per-sweep', 'per-channel-block', 'time-major']
+
+# root attribute of a partial output: the number of sweeps safely on disk
+CHECKPOINT_ATTR = 'checkpoint'
+
+
+def chunk_shape(layout, shape, itemsize):
+    """
+    Computes the /data chunk shape for a named layout
+    @param layout: one of CHUNK_LAYOUTS, or an explicit chunk shape tuple
+    @param shape: the data shape (nSamples x nChannels x nSweeps)
+    @param itemsize: the size of one sample in bytes
+    @return chunk shape tuple, or None to let h5py choose
+    """
+    if layout is None or layout == 'auto' or 0 in shape:
+        return None
+
+    if not isinstance(layout, str):
+        return tuple(int(x) for x in layout)
+
+    samples, channels, sweeps = shape
+
+    if layout == 'per-sweep':
+        return samples, 1, 1
+
+    if layout == 'per-channel-block':
+        sweep_bytes = samples * itemsize
+        return samples, 1, max(1, min(sweeps, CHUNK_TARGET_SIZE // sweep_bytes))
+
+    if layout == 'time-major':
+        sweep_bytes = samples * channels * itemsize
+        return samples, channels, max(1, min(sweeps, CHUNK_TARGET_SIZE // sweep_bytes))
+
+    raise ValueError(f'unknown chunk layout [{layout}]: expected one of {CHUNK_LAYOUTS}')
+
 
 class ABFConverter(FileConverter):
 
     def __init__(self, input_file,
-                 output_file=None, channel_select=None, verbose=False):
+                 output_file=None, channel_select=None, verbose=False,
+                 block_size=None, store_raw=False, chunk_layout='auto',
+                 compress_threads=None, compression=None):
         """
         Constructs a new ABFConverter
         @param input_file: the input file path
@@ -30,11 +75,35 @@ class ABFConverter(FileConverter):
             names to convert
             defaults to all channels
         @param verbose: boolean governing output verbosity
+        @param block_size: number of sweeps to read and write at a time
+            defaults to None (all sweeps in one block)
+        @param store_raw: if true, store the raw ADC counts (int16) in /data
+            with per-channel gains/offsets as header attributes
+            defaults to False (store float64 values in physical units)
+        @param chunk_layout: one of CHUNK_LAYOUTS or an explicit chunk shape
+            for /data, chosen to match how the data will be read
+            defaults to 'auto' (h5py's guess)
+        @param compress_threads: if not None, compress /data chunks in this many
+            threads (0 => one per CPU) and write them directly
+            defaults to None (single-threaded compression inside HDF5)
+            NOTE: only gzip presets can be compressed in threads
+        @param compression: the compression preset (see COMPRESSION_PRESETS)
+            defaults to 'balanced' (gzip 5)
         """
         if channel_select is None:
             channel_select = []
 
+        if block_size is not None and int(block_size) < 1:
+            raise ValueError(f'invalid block size [{block_size}]')
+
         self.__channel_select = channel_select
+        self.__block_size = None if block_size is None else int(block_size)
+        self.__store_raw = store_raw
+        self.__chunk_layout = chunk_layout
+        self.__compress_threads = compress_threads
+
+        # fail early on bad layout names
+        chunk_shape(chunk_layout, (1, 1, 1), 1)
 
         # see if channel_select contains adcNames or channelNumbers
         try:
@@ -44,7 +113,7 @@ class ABFConverter(FileConverter):
         else:
             self.__use_channel_numbers = True
 
-        super().__init__(input_file, output_file, verbose, suffix='.h5')
+        super().__init__(input_file, output_file, verbose, suffix='.h5', compression=compression)
 
     @property
     def channel_select(self):
@@ -53,6 +122,42 @@ class ABFConverter(FileConverter):
         """
         return self.__channel_select
 
+    @property
+    def block_size(self):
+        """
+        The number of sweeps per streamed block (None => all sweeps at once)
+        """
+        return self.__block_size
+
+    @property
+    def store_raw(self):
+        """
+        If true, /data holds raw ADC counts plus header/dataGain and header/dataOffset
+        """
+        return self.__store_raw
+
+    @property
+    def chunk_layout(self):
+        """
+        The /data chunk layout (see CHUNK_LAYOUTS)
+        """
+        return self.__chunk_layout
+
+    @property
+    def compress_threads(self):
+        """
+        The number of chunk compression threads (None => compress inside HDF5)
+        """
+        return self.__compress_threads
+
+    @property
+    def options(self):
+        return dict(
+            super().options,
+            channel_select=list(self.channel_select),
+            store_raw=bool(self.store_raw),
+            chunk_layout=self.chunk_layout)
+
     def process(self):
         """
         Do the conversion work
@@ -62,8 +167,8 @@ class ABFConverter(FileConverter):
         # read data from ABF file
         # =========================================================================
         with Timer(f'read {Path(self.input_file).name}', verbose=self.verbose):
-            # first, we open the file
-            abf = pyabf.ABF(self.input_file)
+            # first, we open the file (header only: data is read by __write_data)
+            abf = pyabf.ABF(self.input_file, loadData=False)
 
             # next, determine the list of channels to convert
             if len(self.channel_select) == 0:
@@ -124,46 +229,149 @@ class ABFConverter(FileConverter):
         # =========================================================================
         # write data to H5 file
         # =========================================================================
+        # NOTE: the data is written to partial_file, which is renamed to output_file
+        # when complete; an interrupted conversion resumes from its last checkpoint
+        checkpoint = self.__resume_point()
+
         with Timer(f'wrote {Path(self.output_file).name}', verbose=self.verbose):
-            with h5py.File(self.output_file, 'w') as f:
-                with Timer(f'\twrote header', verbose=self.verbose):
-                    # write the header as attributes
-                    hdr = f.create_group('header')
-                    hdr.attrs['sweepCount'] = sweep_count
-                    hdr.attrs['sweepSampleCount'] = sweep_samples
-                    hdr.attrs['sampleFreq'] = sample_freq
-                    hdr.attrs['sweepFreq'] = sweep_freq
-                    hdr.attrs['abfTimestamp'] = abf_timestamp
-                    hdr.attrs['recTime'] = rec_time
-                    hdr.attrs['si'] = si / 1e-6
-                    hdr.attrs['recChNames'] = rec_ch_names
-
-                    f.create_dataset(
-                        name='header/sweepTimes',
-                        data=sweep_times,
-                        compression=5)
-
-                    f.create_dataset(
-                        name='header/sweepStartInPts',
-                        data=sweep_start_in_pts,
-                        compression=5)
-
-                abf_data = np.zeros(shape=(
-                    sweep_samples,
-                    len(channels_to_convert),
-                    sweep_count))
-
-                for ix, c in enumerate(channels_to_convert):
-                    abf_data[:, ix, :] = abf.data[c].reshape(
-                        sweep_count,
-                        sweep_samples).T
-
-                with Timer('\twrote data', verbose=self.verbose):
-                    f.create_dataset(
-                        name='data',
-                        data=abf_data,
-                        compression=5)
+            with h5py.File(self.partial_file, 'w' if checkpoint is None else 'r+') as f:
+                if checkpoint is None:
+                    checkpoint = 0
+
+                    with Timer(f'\twrote header', verbose=self.verbose):
+                        # write the header as attributes
+                        hdr = f.create_group('header')
+                        hdr.attrs['sweepCount'] = sweep_count
+                        hdr.attrs['sweepSampleCount'] = sweep_samples
+                        hdr.attrs['sampleFreq'] = sample_freq
+                        hdr.attrs['sweepFreq'] = sweep_freq
+                        hdr.attrs['abfTimestamp'] = abf_timestamp
+                        hdr.attrs['recTime'] = rec_time
+                        hdr.attrs['si'] = si / 1e-6
+                        hdr.attrs['recChNames'] = rec_ch_names
+
+                        f.create_dataset(
+                            name='header/sweepTimes',
+                            data=sweep_times,
+                            **self.h5py_filters)
+
+                        f.create_dataset(
+                            name='header/sweepStartInPts',
+                            data=sweep_start_in_pts,
+                            **self.h5py_filters)
+
+                    # record the source/settings so unchanged inputs can be skipped
+                    # later (and so a partial file is only resumed for the same input)
+                    self._write_manifest(f)
+                elif self.verbose:
+                    print(f'\tresuming at sweep {checkpoint} of {sweep_count}')
+
+                self.__write_data(f, abf, channels_to_convert, checkpoint)
+
+                del f.attrs[CHECKPOINT_ATTR]
+
+            self._commit_output()
 
             # copy permissions, times, etc. from original file
             # NOTE: must be run outside of the "with h5py.File()" block so file is closed
             shutil.copystat(self.input_file, self.output_file)
+
+    def __resume_point(self):
+        # Finds where to resume an interrupted conversion
+        # @return the number of sweeps committed to partial_file, or None to start over
+        #     (no partial file, or one that is unreadable or from another input/settings)
+        if not os.path.exists(self.partial_file):
+            return None
+
+        if self._matches_manifest(self.read_manifest(self.partial_file)):
+            try:
+                with h5py.File(self.partial_file, 'r') as f:
+                    if 'data' in f:
+                        return int(f.attrs[CHECKPOINT_ATTR])
+            except (OSError, KeyError):
+                pass
+
+        os.remove(self.partial_file)
+        return None
+
+    def __write_data(self, f, abf, channels_to_convert, resume_from=0):
+        # write the data set to disk block_size sweeps at a time (default: all)
+        # committing a checkpoint (the number of sweeps written) after each block
+        # NOTE: only the selected channels are de-interleaved and scaled, straight
+        # into the output layout; ABFMap scales exactly like pyabf, so the values
+        # (and, for the 'auto' layout, the chunking) match what a float64 copy
+        # of abf.data would produce
+        # @param f: the open h5py.File
+        # @param abf: the pyabf.ABF object (header only)
+        # @param channels_to_convert: list of channel indices
+        # @param resume_from: the checkpoint of a resumed partial file (0 => new file)
+        sweep_count = abf.sweepCount
+        sweep_samples = abf.sweepPointCount
+        block_size = self.block_size or max(sweep_count, 1)
+
+        with Timer('\twrote data', verbose=self.verbose), ABFMap(self.input_file) as abf_map:
+            if resume_from > 0:
+                dset = f['data']
+                dtype = dset.dtype
+            else:
+                if self.store_raw:
+                    # float-format ABF files are stored as-is (unit gain, zero offset)
+                    dtype = abf_map.dtype
+                    gains = abf_map.gains if abf_map.is_scaled else np.ones(abf_map.channel_count)
+                    offsets = abf_map.offsets if abf_map.is_scaled else np.zeros(abf_map.channel_count)
+
+                    f['header'].attrs['dataGain'] = gains[channels_to_convert]
+                    f['header'].attrs['dataOffset'] = offsets[channels_to_convert]
+                else:
+                    dtype = np.float64
+
+                shape = (sweep_samples, len(channels_to_convert), sweep_count)
+
+                dset = f.create_dataset(
+                    name='data',
+                    shape=shape,
+                    dtype=dtype,
+                    chunks=chunk_shape(self.chunk_layout, shape, np.dtype(dtype).itemsize),
+                    **self.h5py_filters)
+
+            f.attrs[CHECKPOINT_ATTR] = resume_from
+
+            writer = None
+
+            if self.compress_threads is not None and dset.compression == 'gzip':
+                writer = ParallelChunkWriter(dset, threads=self.compress_threads)
+
+                # direct chunk writes need whole chunks: round blocks up to the chunk depth
+                chunk_sweeps = dset.chunks[2]
+                block_size = -(-block_size // chunk_sweeps) * chunk_sweeps
+
+                # ... and to start on a chunk boundary (rewriting a partial chunk)
+                resume_from -= resume_from % chunk_sweeps
+
+            try:
+                for start in range(resume_from, sweep_count, block_size):
+                    stop = min(start + block_size, sweep_count)
+
+                    # (sweeps x samples) per channel => (samples x channels x sweeps)
+                    block = np.empty(shape=(sweep_samples, len(channels_to_convert), stop - start), dtype=dtype)
+
+                    for ix, c in enumerate(channels_to_convert):
+                        raw = abf_map.channel(c)[start:stop]
+
+                        if self.store_raw:
+                            block[:, ix, :] = raw.T
+                        else:
+                            block[:, ix, :] = abf_map.scale(raw, c).T
+
+                    if writer is None:
+                        dset[:, :, start:stop] = block
+                    else:
+                        writer.write(block, (0, 0, start))
+
+                    # commit the checkpoint only once the block is on disk
+                    f.flush()
+                    f.attrs[CHECKPOINT_ATTR] = stop
+                    f.flush()
+            finally:
+                if writer is not None:
+                    writer.close()
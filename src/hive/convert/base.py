@@ -6,16 +6,77 @@ Created on May 15, 2019
 
 from abc import ABC, abstractmethod
 from pathlib import Path
+import hashlib
+import json
 import os
+
+import h5py
 from dfply import *  # @UnusedWildImport
 
+# bytes sampled from each end of the input file for the manifest hash
+HASH_SAMPLE_SIZE = 1 << 20
+
+# named compression presets, as h5py dataset filters and PyTables (pandas HDFStore) filters
+#   none:     no compression
+#   fast:     lzf / blosc:lz4 (NOTE: readable by h5py / PyTables, but not by plain HDF5 clients)
+#   balanced: gzip (zlib) level 5
+#   archive:  gzip (zlib) level 9
+COMPRESSION_PRESETS = {
+    'none': {
+        'h5py': {'compression': None},
+        'pytables': {'complib': None, 'complevel': 0}
+    },
+    'fast': {
+        'h5py': {'compression': 'lzf'},
+        'pytables': {'complib': 'blosc:lz4', 'complevel': 1}
+    },
+    'balanced': {
+        'h5py': {'compression': 'gzip', 'compression_opts': 5},
+        'pytables': {'complib': 'zlib', 'complevel': 5}
+    },
+    'archive': {
+        'h5py': {'compression': 'gzip', 'compression_opts': 9},
+        'pytables': {'complib': 'zlib', 'complevel': 9}
+    }
+}
+
+
+def fast_hash(file, sample_size=HASH_SAMPLE_SIZE):
+    """
+    Computes a fast content hash of a file from its size and first/last sample_size bytes
+    @param file: the file path
+    @param sample_size: number of bytes to sample from each end of the file
+    @return hex digest string
+    """
+    h = hashlib.blake2b(digest_size=16)
+    size = os.path.getsize(file)
+    h.update(str(size).encode())
+
+    with open(file, 'rb') as fb:
+        h.update(fb.read(sample_size))
+
+        if size > sample_size:
+            fb.seek(max(sample_size, size - sample_size))
+            h.update(fb.read(sample_size))
+
+    return h.hexdigest()
+
 
 class FileConverter(ABC):
     """
     Base class for file format conversion
     """
 
-    def __init__(self, input_file, output_file=None, verbose=False, suffix='.out'):
+    # bump when a change to the converter changes its output
+    version = '1.0'
+
+    # name of the output file attribute holding the conversion manifest
+    manifest_attr = 'manifest'
+
+    # the compression preset used when none is given
+    default_compression = 'balanced'
+
+    def __init__(self, input_file, output_file=None, verbose=False, suffix='.out', compression=None):
         """
         Constructs a new LVMConverter
         @param input_file: the input file path
@@ -23,9 +84,18 @@ class FileConverter(ABC):
             defaults to input file with extension replaced with suffix
         @param verbose: boolean governing output verbosity
         @param suffix: suffix to use for default output filename
+        @param compression: the name of one of COMPRESSION_PRESETS
+            defaults to default_compression
         """
+        if compression is None:
+            compression = self.default_compression
+
+        if compression not in COMPRESSION_PRESETS:
+            raise ValueError(f'unknown compression [{compression}]: expected one of {list(COMPRESSION_PRESETS)}')
+
         self.__input_file = input_file
         self.__verbose = verbose
+        self.__compression = compression
 
         in_path = Path(input_file)
 
@@ -58,6 +128,121 @@ class FileConverter(ABC):
         """
         return self.__verbose
 
+    @property
+    def compression(self):
+        """
+        The compression preset (see COMPRESSION_PRESETS)
+        """
+        return self.__compression
+
+    @property
+    def h5py_filters(self):
+        """
+        The compression preset as keyword arguments to h5py create_dataset()
+        """
+        return dict(COMPRESSION_PRESETS[self.compression]['h5py'])
+
+    @property
+    def pytables_filters(self):
+        """
+        The compression preset as keyword arguments to pandas to_hdf() or HDFStore()
+        """
+        return dict(COMPRESSION_PRESETS[self.compression]['pytables'])
+
+    @property
+    def options(self):
+        """
+        The conversion options that affect the output (recorded in the manifest)
+        """
+        return {
+            'compression': self.compression
+        }
+
+    def manifest(self, content_hash=None):
+        """
+        Describes the current input file and conversion settings
+        @param content_hash: the precomputed fast_hash() of the input
+            defaults to computing it
+        @return dict
+        """
+        stat = os.stat(self.input_file)
+
+        return {
+            'source': str(Path(self.input_file).resolve()),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'hash': content_hash or fast_hash(self.input_file),
+            'converter': type(self).__name__,
+            'version': self.version,
+            'options': self.options
+        }
+
+    def read_manifest(self, h5_file=None):
+        """
+        Reads the manifest recorded in an output file
+        @param h5_file: the file to read
+            defaults to output_file
+        @return dict, or None if the file or its manifest does not exist
+        """
+        try:
+            with h5py.File(h5_file or self.output_file, 'r') as f:
+                manifest = f.attrs.get(self.manifest_attr)
+        except (OSError, ValueError):
+            return None
+
+        return None if manifest is None else json.loads(manifest)
+
+    def _write_manifest(self, f=None):
+        # Records the manifest in an output file
+        # NOTE: call before copying file stats, since this modifies the output
+        # @param f: an open (writable) h5py.File
+        #     defaults to opening the (closed) output_file
+        if f is None:
+            with h5py.File(self.output_file, 'a') as f:
+                self._write_manifest(f)
+        else:
+            f.attrs[self.manifest_attr] = json.dumps(self.manifest())
+
+    def _matches_manifest(self, recorded):
+        # Checks whether a recorded manifest describes the current input and settings
+        # The content hash is only computed if the input size matches but the mtime changed.
+        # @param recorded: the manifest dict (or None)
+        if recorded is None:
+            return False
+
+        # round-trip through JSON so options compare like-for-like
+        current = json.loads(json.dumps(self.manifest(content_hash=recorded.get('hash'))))
+
+        keys = ['source', 'size', 'converter', 'version', 'options']
+
+        if any(recorded.get(k) != current[k] for k in keys):
+            return False
+
+        if recorded.get('mtime') == current['mtime']:
+            return True
+
+        # touched but possibly unchanged: compare contents
+        return recorded.get('hash') == fast_hash(self.input_file)
+
+    def is_up_to_date(self):
+        """
+        Checks whether the output was converted from the current input with the current settings
+        The content hash is only computed if the input size matches but the mtime changed.
+        @return boolean
+        """
+        return self._matches_manifest(self.read_manifest())
+
+    @property
+    def partial_file(self):
+        """
+        The temporary file written during conversion, renamed to output_file when complete
+        """
+        return self.output_file + '.part'
+
+    def _commit_output(self):
+        # Atomically replaces the output file with the completed partial file
+        os.replace(self.partial_file, self.output_file)
+
     @make_symbolic
     def _combine_date_time(self, date_s, time_s):
         # [dfply] Combines date part of one series with time part of other series
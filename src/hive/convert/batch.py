@@ -0,0 +1,67 @@
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Parallel batch processing of FileConverter instances
+"""
+
+import os
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+ConversionResult = namedtuple(
+    'ConversionResult',
+    ['input_file', 'output_file', 'elapsed', 'error'])
+
+
+def run_converter(converter):
+    """
+    Runs one conversion, capturing (rather than raising) any error
+    @param converter: the FileConverter to process
+    @return ConversionResult; error is None on success, else a formatted traceback
+    """
+    start_time = time.time()
+
+    try:
+        converter.process()
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+
+    return ConversionResult(
+        converter.input_file,
+        converter.output_file,
+        time.time() - start_time,
+        error)
+
+
+def process_all(converters, jobs=1):
+    """
+    Runs conversions in a process pool, yielding results as they complete
+    (so one slow file does not hold back the others' results; sort them by
+    input_file if input order is needed)
+    A failed conversion is reported in its result and does not stop the others.
+    @param converters: iterable of FileConverter instances (must be picklable)
+    @param jobs: number of worker processes
+        0 or None => one per CPU; 1 => run serially in this process
+    @return generator of ConversionResult
+    """
+    if jobs is not None and jobs < 0:
+        raise ValueError(f'invalid number of jobs [{jobs}]')
+
+    if not jobs:
+        jobs = os.cpu_count()
+
+    if jobs == 1:
+        for converter in converters:
+            yield run_converter(converter)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_converter, c) for c in converters]
+
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,97 @@
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Multi-threaded gzip compression of HDF5 chunks via direct chunk writes
+"""
+
+import itertools
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# target size of one (uncompressed) chunk
+CHUNK_TARGET_SIZE = 1 << 20
+
+
+class ParallelChunkWriter:
+    """
+    Writes blocks of a gzip-compressed, chunked h5py dataset, compressing the
+    chunks in a thread pool (zlib releases the GIL) and writing the compressed
+    bytes with write_direct_chunk(). The result is a standard deflate-filtered
+    dataset, readable by any HDF5 client.
+
+    NOTE: the dataset must have a gzip filter and no other filters, and every
+    written block must start on a chunk boundary and cover whole chunks
+    (or run to the edge of the dataset).
+    """
+
+    def __init__(self, dataset, threads=None):
+        """
+        Constructs a new ParallelChunkWriter
+        @param dataset: the h5py.Dataset to write
+        @param threads: number of compression threads
+            defaults to one per CPU
+        """
+        if dataset.chunks is None or dataset.compression != 'gzip':
+            raise ValueError(f'{dataset.name} must be chunked and gzip-compressed')
+
+        if dataset.shuffle or dataset.fletcher32 or dataset.scaleoffset is not None:
+            raise ValueError(f'{dataset.name} must have no filters besides gzip')
+
+        self.__dataset = dataset
+        self.__level = dataset.compression_opts
+        self.__executor = ThreadPoolExecutor(max_workers=threads or os.cpu_count())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def dataset(self):
+        return self.__dataset
+
+    def __compress(self, block, index):
+        # Compresses the chunk of block that starts at index (block coordinates)
+        # Edge chunks are padded with the fill value (zero) to the full chunk shape
+        chunks = self.__dataset.chunks
+        chunk = block[tuple(slice(i, i + c) for i, c in zip(index, chunks))]
+
+        if chunk.shape != chunks:
+            padded = np.zeros(chunks, dtype=block.dtype)
+            padded[tuple(slice(0, n) for n in chunk.shape)] = chunk
+            chunk = padded
+
+        return zlib.compress(np.ascontiguousarray(chunk).tobytes(), self.__level)
+
+    def write(self, block, origin):
+        """
+        Writes a block of data
+        @param block: the array to write (converted to the dataset dtype)
+        @param origin: the dataset coordinates of block[0, 0, ...]
+            must be a multiple of the chunk shape
+        """
+        chunks = self.__dataset.chunks
+        block = np.asarray(block, dtype=self.__dataset.dtype)
+
+        if any(o % c for o, c in zip(origin, chunks)):
+            raise ValueError(f'block origin {tuple(origin)} is not aligned to chunks {chunks}')
+
+        indices = list(itertools.product(*[
+            range(0, n, c) for n, c in zip(block.shape, chunks)
+        ]))
+
+        compressed = self.__executor.map(lambda ix: self.__compress(block, ix), indices)
+
+        # HDF5 writes stay on this thread
+        for index, data in zip(indices, compressed):
+            offset = tuple(o + i for o, i in zip(origin, index))
+            self.__dataset.id.write_direct_chunk(offset, data)
+
+    def close(self):
+        self.__executor.shutdown()
@@ -7,130 +7,411 @@ Created on Thu Sep  6 20:40:14 2018
 Converter for opm-MEG LVM files to H5 databases
 """
 import shutil
+
+import h5py
 from dfply import *
 
 from hive.convert.base import FileConverter
+from hive.convert.chunks import CHUNK_TARGET_SIZE, ParallelChunkWriter
+from hive.io.lvm import (LVM_BUFFER_SIZE, LVM_ENGINES, LVM_LAYOUTS, SEGMENT_OFFSET_COLUMN, open_segment, parse_time,
+                         read_data, read_header, split_fields)
 from hive.timer import Timer
 
+# types the channel values may be stored as (X_Value, and so time, is always float64)
+LVM_DTYPES = ['float64', 'float32']
+
 
 class LVMConverter(FileConverter):
 
-    def __init__(self, input_file, output_file=None, verbose=False):
+    # zlib 9, as the tables have always been written
+    default_compression = 'archive'
+
+    # NOTE: 1.1 records the channel offsets of every segment (see SEGMENT_OFFSET_COLUMN);
+    # 1.2 stores the values layout as plain arrays (no index column)
+    version = '1.2'
+
+    def __init__(self, input_file, output_file=None, verbose=False, block_size=None,
+                 engine='c', dtype='float64', layout='tables', compress_threads=None,
+                 compression=None):
         """
         Constructs a new LVMConverter
         @param input_file: the input file path
         @param output_file: the output file path
             defaults to input file with extension replaced with .h5
         @param verbose: boolean governing output verbosity
+        @param block_size: number of data rows to parse, arrange and write at a time
+            defaults to None (all rows in one block)
+        @param engine: the data parser, one of LVM_ENGINES
+            defaults to 'c' (pandas)
+        @param dtype: the type of the stored channel values, one of LVM_DTYPES
+            defaults to 'float64'
+        @param layout: the output layout, one of LVM_LAYOUTS
+            defaults to 'tables'
+        @param compress_threads: if not None, compress /data chunks in this many
+            threads (0 => one per CPU) and write them directly (matrix layout only)
+            defaults to None (single-threaded compression inside HDF5)
+            NOTE: only gzip presets can be compressed in threads
+        @param compression: the compression preset (see COMPRESSION_PRESETS)
+            defaults to 'archive' (zlib 9)
+        """
+        if block_size is not None and int(block_size) < 1:
+            raise ValueError(f'invalid block size [{block_size}]')
+
+        if engine not in LVM_ENGINES:
+            raise ValueError(f'unknown engine [{engine}]: expected one of {LVM_ENGINES}')
+
+        if np.dtype(dtype).name not in LVM_DTYPES:
+            raise ValueError(f'unsupported dtype [{dtype}]: expected one of {LVM_DTYPES}')
+
+        if layout not in LVM_LAYOUTS:
+            raise ValueError(f'unknown layout [{layout}]: expected one of {LVM_LAYOUTS}')
+
+        self.__block_size = None if block_size is None else int(block_size)
+        self.__engine = engine
+        self.__dtype = np.dtype(dtype).name
+        self.__layout = layout
+        self.__compress_threads = compress_threads
+
+        super().__init__(input_file, output_file, verbose, suffix='.h5', compression=compression)
+
+    @property
+    def block_size(self):
+        """
+        The number of data rows per streamed block (None => all rows at once)
+        """
+        return self.__block_size
+
+    @property
+    def engine(self):
+        """
+        The data parse engine (see LVM_ENGINES)
+        """
+        return self.__engine
+
+    @property
+    def dtype(self):
+        """
+        The type of the stored channel values (see LVM_DTYPES)
+        """
+        return self.__dtype
+
+    @property
+    def layout(self):
+        """
+        The output layout (see LVM_LAYOUTS)
+        """
+        return self.__layout
+
+    @property
+    def compress_threads(self):
+        """
+        The number of chunk compression threads (None => compress inside HDF5)
         """
-        super().__init__(input_file, output_file, verbose, suffix='.h5')
+        return self.__compress_threads
+
+    @property
+    def options(self):
+        return dict(
+            super().options,
+            dtype=self.dtype,
+            layout=self.layout)
 
     def process(self):
         """
         Do the conversion work
         """
 
-        # =========================================================================
-        # read data from LVM file
-        # =========================================================================
-        with Timer(f'read {self.input_file}', verbose=self.verbose):
-            # first, we read in the header portion
-            hdr = pd.read_csv(self.input_file,
-                              sep='\t',
-                              skiprows=14,
-                              nrows=7,
-                              header=None)
-
-            # next, we re-shape the header to a table of channel attributes
-            seconds = pd.Timedelta(seconds=1.0)
-
-            header = (
-                    hdr >>
-                    gather('channel', 'value', columns_from(1)) >>
-                    spread(0, X.value, convert=True) >>
-                    mask(X.Samples > 0) >>
-                    mutate(channel=X.channel - colmin(X.channel)) >>
-                    mutate(offset=(X.Time - colmin(X.Time)) / seconds) >>
-                    mutate(start=self._combine_date_time(X.Date, X.Time)) >>
-                    mutate(name=self._as_string(X.channel, format_string='ch{:03d}')) >>
-                    mutate(Samples=self._as_int(X.Samples)) >>
-                    select(
-                        X.channel,
-                        X.name,
-                        X.offset,
-                        X.start,
-                        X.Samples,
-                        X.Y_Unit_Label,
-                        X.X_Dimension,
-                        X.X0,
-                        X.Delta_X) >>
-                    arrange(X.channel)
-            )
-
-            # next, we load in the actual data (n_obvs x n_chan)
-            dat = pd.read_csv(self.input_file, sep='\t', skiprows=22)
-
-            # now, let's replace the dummy name we created in the
-            # header above with the actual channel name from the
-            # column names
-            header['name'] = dat.columns.drop(['X_Value', 'Comment'])
-
-        # =========================================================================
-        # reshape the data
-        # =========================================================================
-        with Timer(f'arrange {self.input_file}', verbose=self.verbose):
-            # select only the channels we want: cuts down on memory and processing
-            channels = (
-                    header >>
-                    select(X.channel, X.name, X.offset)
-            )
-
-            # here's where we re-arrange
-            # noinspection PyShadowingNames
-            data = (
-                    dat >>
-                    mutate(frame=row_number(X.X_Value)) >>
-                    mutate(frame=self._as_int(X.frame)) >>
-                    drop(X.Comment) >>
-                    gather('name', 'Y_Value', starts_with('Input')) >>
-                    inner_join(channels, by='name') >>
-                    mutate(time=X.X_Value + X.offset) >>
-                    select(X.channel, X.frame, X.time, X.Y_Value)
-            )
-
-        # =========================================================================
-        # write data to H5 file
-        # =========================================================================
-        with Timer(f'write {self.output_file}', verbose=self.verbose):
-            header.to_hdf(
-                self.output_file,
-                mode='w',
-                format='table',
-                key='header',
-                complib='zlib',
-                complevel=9,
-                data_columns=True,
-                index=False
-            )
-
-            # ...and a table for each channel
-            for chan in channels['channel']:
-                ch = (
-                        data >>
-                        mask(X.channel == chan) >>
-                        arrange(X.frame)
+        # NOTE: the file is scanned once: each header is parsed line by line and
+        # the same handle is then passed on to the data parser
+        with open(self.input_file, 'rb', buffering=LVM_BUFFER_SIZE) as fh:
+            # =====================================================================
+            # read data from LVM file
+            # =====================================================================
+            with Timer(f'read {self.input_file}', verbose=self.verbose):
+                # first, we read in the file and (first) segment headers
+                read_header(fh)
+                header_offset = fh.tell()
+                segment = read_header(fh)
+
+                # the data columns are X_Value, the channel names and Comment
+                columns = split_fields(fh.readline())
+
+                # next, we build the table of channel attributes
+                header = self.__channel_table(segment, columns[1:-1])
+
+                # next, we open the actual data (n_obvs x n_chan) of every
+                # segment, block_size rows at a time
+                segments = []
+                blocks = self.__read_segments(fh, header, header_offset, columns, segments)
+
+            # =====================================================================
+            # write the data to the H5 file, one block at a time
+            # =====================================================================
+            with Timer(f'write {self.output_file}', verbose=self.verbose):
+                header.to_hdf(
+                    self.output_file,
+                    mode='w',
+                    format='table',
+                    key='header',
+                    **self.pytables_filters,
+                    data_columns=True,
+                    index=False
                 )
 
-                ch.to_hdf(
+                if self.layout == 'matrix':
+                    self.__write_matrix(blocks, header, segments)
+                elif self.layout == 'values':
+                    self.__write_values(blocks, header)
+                else:
+                    self.__write_tables(blocks)
+
+                # ...and the segment index
+                pd.DataFrame(segments).to_hdf(
                     self.output_file,
-                    mode='r+',
+                    mode='a',
                     format='table',
-                    key=f'data/ch{chan:03d}',
-                    complib='zlib',
-                    complevel=9,
+                    key='segments',
+                    **self.pytables_filters,
                     data_columns=True,
                     index=False
                 )
 
-            # copy permissions, times, etc. from original file
-            shutil.copystat(self.input_file, self.output_file)
+        # record the source/settings so unchanged inputs can be skipped later
+        self._write_manifest()
+
+        # copy permissions, times, etc. from original file
+        shutil.copystat(self.input_file, self.output_file)
+
+    @staticmethod
+    def __channel_table(segment, names):
+        # Builds the table of channel attributes from a segment header
+        # NOTE: header rows have trailing empty fields; the channels are
+        # the columns with a sample count
+        # @param segment: the segment header, from read_header()
+        # @param names: the channel names, from the data column names
+        count = len([s for s in segment['Samples'] if s.strip()])
+
+        if count != len(names):
+            raise ValueError(f'header lists {count} channels, data has {len(names)}: {names}')
+
+        def values(key):
+            return segment[key][:count]
+
+        seconds = pd.Timedelta(seconds=1.0)
+        date = pd.to_datetime(pd.Series(values('Date')), format='%Y/%m/%d')
+        time = pd.Series(pd.to_timedelta([parse_time(t) for t in values('Time')]))
+
+        return pd.DataFrame({
+            'channel': np.arange(count),
+            'name': names,
+            'offset': (time - time.min()) / seconds,
+            'start': date + time,
+            'Samples': pd.to_numeric(pd.Series(values('Samples'))).astype(int),
+            'Y_Unit_Label': values('Y_Unit_Label'),
+            'X_Dimension': values('X_Dimension'),
+            'X0': pd.to_numeric(pd.Series(values('X0'))),
+            'Delta_X': pd.to_numeric(pd.Series(values('Delta_X')))
+        })
+
+    def __read_segments(self, fh, header, header_offset, columns, segments):
+        # Reads the data of every segment, block_size rows at a time
+        # NOTE: all segments must have the same channels; they are written one
+        # after the other, so the frame counter carries across segments
+        # @param fh: the LVM file, positioned at the first data row
+        # @param header: the channel table of the first segment
+        # @param header_offset: the byte offset of the first segment header
+        # @param columns: the data column names
+        # @param segments: list to which a dict describing each segment is appended
+        #     (once all of its data has been read)
+        # @return generator of (channel table, DataFrame block)
+        # NOTE: Comment is never parsed; X_Value (and so time) stays float64
+        dtypes = {name: self.dtype for name in columns[:-1]}
+        dtypes['X_Value'] = 'float64'
+
+        frames = 0
+
+        while True:
+            data_offset = fh.tell()
+            rows = 0
+
+            with open_segment(fh) as stream:
+                for dat in read_data(stream, dtypes, engine=self.engine, block_size=self.block_size):
+                    yield header, dat
+                    rows += len(dat)
+
+            segments.append({
+                'segment': len(segments),
+                'header_offset': header_offset,
+                'data_offset': data_offset,
+                'frame': frames,
+                'rows': rows,
+                'start': header['start'].min(),
+                'X0': header['X0'][0],
+                'Delta_X': header['Delta_X'][0],
+                **{
+                    SEGMENT_OFFSET_COLUMN.format(chan): offset
+                    for chan, offset in zip(header['channel'], header['offset'])
+                }
+            })
+
+            frames += rows
+
+            # next segment (if any)
+            header_offset = fh.tell()
+            segment = read_header(fh)
+
+            if segment is None:
+                return
+
+            if split_fields(fh.readline()) != columns:
+                raise ValueError(f'segment {len(segments)}: columns do not match segment 0: {columns}')
+
+            header = self.__channel_table(segment, columns[1:-1])
+
+    def __write_tables(self, blocks):
+        # Re-arranges each block into a table per channel and appends it
+        # @param blocks: (channel table, data block) pairs, from __read_segments()
+        with pd.HDFStore(self.output_file, mode='a', **self.pytables_filters) as store:
+            # NOTE: the frame counter carries across blocks
+            frames = 0
+
+            for channels, dat in blocks:
+                with Timer(f'\twrote frames {frames}-{frames + len(dat)}', verbose=self.verbose):
+                    # ...and append to a table for each channel
+                    for chan, ch in self.__arrange(dat, channels, frames):
+                        store.append(
+                            f'data/ch{chan:03d}',
+                            ch,
+                            format='table',
+                            data_columns=True,
+                            index=False
+                        )
+
+                frames += len(dat)
+
+    def __write_values(self, blocks, header):
+        # Appends the values of each channel to a 1-D data/chNNN dataset (the frame
+        # is the array index), in whole chunks (see __append_blocks())
+        # @param blocks: (channel table, data block) pairs, from __read_segments()
+        # @param header: the channel table
+        names = list(header['name'])
+        dtype = np.dtype(self.dtype)
+        chunk_rows = max(1, CHUNK_TARGET_SIZE // dtype.itemsize)
+
+        with h5py.File(self.output_file, 'a') as f:
+            dsets = []
+
+            for chan, name in zip(header['channel'], names):
+                dset = f.create_dataset(
+                    name=f'data/ch{chan:03d}',
+                    shape=(0,),
+                    maxshape=(None,),
+                    dtype=dtype,
+                    chunks=(chunk_rows,),
+                    **self.h5py_filters)
+
+                dset.attrs['name'] = name
+                dsets.append(dset)
+
+            def append(values, start):
+                for ix, dset in enumerate(dsets):
+                    dset.resize(start + len(values), axis=0)
+                    dset[start:start + len(values)] = values[:, ix]
+
+            self.__append_blocks(blocks, names, dtype, chunk_rows, append)
+
+    def __write_matrix(self, blocks, header, segments):
+        # Appends the channel columns of each block to one (n_frames x n_channels)
+        # dataset, in whole chunks (see __append_blocks())
+        # @param blocks: (channel table, data block) pairs, from __read_segments()
+        # @param header: the channel table
+        # @param segments: the segment list filled in by __read_segments()
+        names = list(header['name'])
+        dtype = np.dtype(self.dtype)
+        chunk_rows = max(1, CHUNK_TARGET_SIZE // (max(len(names), 1) * dtype.itemsize))
+
+        with h5py.File(self.output_file, 'a') as f:
+            dset = f.create_dataset(
+                name='data',
+                shape=(0, len(names)),
+                maxshape=(None, len(names)),
+                dtype=dtype,
+                chunks=(chunk_rows, max(len(names), 1)),
+                **self.h5py_filters)
+
+            # what's needed to rebuild time without the header table
+            dset.attrs['channels'] = names
+            dset.attrs['X0'] = header['X0'].to_numpy()
+            dset.attrs['Delta_X'] = header['Delta_X'].to_numpy()
+
+            writer = None
+
+            if self.compress_threads is not None and dset.compression == 'gzip':
+                writer = ParallelChunkWriter(dset, threads=self.compress_threads)
+
+            def append(values, start):
+                dset.resize(start + len(values), axis=0)
+
+                if writer is None:
+                    dset[start:start + len(values)] = values
+                else:
+                    writer.write(values, (start, 0))
+
+            try:
+                self.__append_blocks(blocks, names, dtype, chunk_rows, append)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+            # the channel offsets of each segment (known once every segment has been read)
+            offset_columns = [SEGMENT_OFFSET_COLUMN.format(chan) for chan in header['channel']]
+            f.create_dataset(name='offset', data=pd.DataFrame(segments)[offset_columns].to_numpy())
+
+    def __append_blocks(self, blocks, names, dtype, chunk_rows, append):
+        # Appends the channel columns of each block, as (rows x channels) values
+        # NOTE: rows are written in whole chunks (the remainder is carried over
+        # to the next block), so each chunk is compressed exactly once
+        # @param blocks: (channel table, data block) pairs, from __read_segments()
+        # @param names: the channel names (data columns), in channel order
+        # @param dtype: the stored type
+        # @param chunk_rows: the number of rows per chunk
+        # @param append: function(values, start frame) that writes the values
+        frames = 0
+        pending = np.empty((0, len(names)), dtype=dtype)
+
+        for _, dat in blocks:
+            with Timer(f'\twrote frames {frames}-{frames + len(dat)}', verbose=self.verbose):
+                values = np.concatenate([pending, dat[names].to_numpy(dtype=dtype)])
+                count = len(values) - len(values) % chunk_rows
+
+                if count > 0:
+                    append(values[:count], frames)
+
+                frames += count
+                pending = values[count:]
+
+        if len(pending) > 0:
+            append(pending, frames)
+
+    @staticmethod
+    def __arrange(dat, channels, frames):
+        # Splits one block of data into a (channel, frame, time, Y_Value) table per channel
+        # NOTE: each channel is sliced straight out of its column (frames are numbered
+        # in file order, from 1), rather than melting the block into one long frame
+        # @param dat: the data block (n_obvs x n_chan)
+        # @param channels: the channel table (channel, name, offset)
+        # @param frames: the number of frames in preceding blocks
+        # @return generator of (channel, DataFrame), indexed by (zero-based) frame
+        index = pd.RangeIndex(frames, frames + len(dat))
+        frame = np.arange(frames + 1, frames + len(dat) + 1, dtype=np.int64)
+        x_value = dat['X_Value'].to_numpy()
+
+        for chan, name, offset in zip(channels['channel'], channels['name'], channels['offset']):
+            yield chan, pd.DataFrame(
+                {
+                    'channel': np.full(len(dat), chan, dtype=np.int64),
+                    'frame': frame,
+                    'time': x_value + offset,
+                    'Y_Value': dat[name].to_numpy()
+                },
+                index=index)
@@ -0,0 +1,8 @@
+#
+__all__ = [
+    'abf',
+    'abfh5',
+    'lvm',
+    'lvmh5',
+    'session'
+]
@@ -0,0 +1,536 @@
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Lightweight, memory-mapped access to ABF (Axon binary format) data
+"""
+
+import os
+import struct
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+
+ABF_BLOCK_SIZE = 512
+ABF1_HEADER_SIZE = 6144
+
+# byte positions of the ABF2 section map entries (uBlockIndex, uBytes, llNumEntries)
+ABF2_SECTIONS = {
+    'protocol': 76,
+    'adc': 92,
+    'dac': 108,
+    'epoch': 124,
+    'adcPerDac': 140,
+    'epochPerDac': 156,
+    'userList': 172,
+    'statsRegion': 188,
+    'math': 204,
+    'strings': 220,
+    'data': 236,
+    'tag': 252,
+    'scope': 268,
+    'delta': 284,
+    'voiceTag': 300,
+    'synchArray': 316,
+    'annotation': 332,
+    'stats': 348
+}
+
+ABF_DTYPES = {
+    0: np.dtype('<i2'),
+    1: np.dtype('<f4')
+}
+
+
+class ABFFormatError(ValueError):
+    """
+    Raised for files that are not ABF files, or use an unsupported ABF format
+    """
+    pass
+
+
+class ABFSection(namedtuple('ABFSection', ['block_index', 'entry_size', 'entry_count'])):
+    """
+    An entry in the ABF2 section map
+    """
+    __slots__ = ()
+
+    @property
+    def byte_start(self):
+        return self.block_index * ABF_BLOCK_SIZE
+
+
+def read_section_map(fb):
+    """
+    Reads the section map of an ABF2 file
+    @param fb: the ABF file opened for binary reading
+    @return dict of section name => ABFSection
+    """
+    fb.seek(0)
+    header = fb.read(ABF_BLOCK_SIZE)
+
+    if header[:4] != b'ABF2':
+        raise ABFFormatError(f'not an ABF2 file: {getattr(fb, "name", fb)}')
+
+    return {
+        name: ABFSection(*struct.unpack_from('<IIq', header, offset))
+        for name, offset in ABF2_SECTIONS.items()
+    }
+
+
+def _unpack(fmt, buffer, offset):
+    # struct.unpack_from() that returns a scalar for single-value formats
+    values = struct.unpack_from(fmt, buffer, offset)
+    return values[0] if len(values) == 1 else list(values)
+
+
+def _decode(value):
+    # decodes a fixed-width ABF1 string field
+    return value.decode('ascii', errors='ignore').strip()
+
+
+def _read_indexed_strings(fb, section):
+    # Reads the indexed strings (names, units, paths) from the first entry
+    # of the ABF2 strings section, the same way pyabf does
+    # @param fb: the ABF file opened for binary reading
+    # @param section: the strings ABFSection
+    if section.entry_count == 0:
+        return []
+
+    fb.seek(section.byte_start)
+    raw = fb.read(section.entry_size)
+    raw = raw[raw.rfind(b'\x00\x00'):].replace(b'\xb5', b'\x75')
+
+    return [s.decode('ascii', errors='replace').strip() for s in raw.split(b'\x00')[1:]]
+
+
+def _read_entries(fb, section, fmt, offset):
+    # Reads one field from every entry of an ABF2 section
+    # @param fb: the ABF file opened for binary reading
+    # @param section: the ABFSection
+    # @param fmt: the struct format of the field
+    # @param offset: the byte offset of the field within an entry
+    fb.seek(section.byte_start)
+    buffer = fb.read(section.entry_size * section.entry_count)
+
+    return [_unpack(fmt, buffer, section.entry_size * i + offset) for i in range(section.entry_count)]
+
+
+class ABFMap:
+    """
+    Memory-mapped view of the data block of an ABF file
+
+    The header is parsed as by read_abf_header() (a few KB are read); the
+    samples themselves stay on disk until they are touched.
+
+    NOTE: channel scaling follows pyabf exactly, so read() returns the same
+    float32 values as pyabf.ABF(...).data
+    """
+
+    def __init__(self, abf_file):
+        """
+        Constructs a new ABFMap
+        @param abf_file: the ABF file path
+        """
+        self.__path = str(abf_file)
+        header = _read_header(self.__path)
+
+        if header['data_format'] not in ABF_DTYPES:
+            raise ABFFormatError(f'unknown data format: {header["data_format"]}')
+
+        self.__version = header['version']
+        self.__data_format = header['data_format']
+        self.__sweep_count = header['sweep_count']
+        self.__sweep_point_count = header['sweep_point_count']
+        self.__channel_count = len(header['adc_num'])
+        self.__sample_rate = header['data_rate']
+        self.__data_byte_start = header['data_byte_start']
+        self.__adc_names = header['adc_names']
+        self.__adc_units = header['adc_units']
+        self.__gains = header['gains']
+        self.__offsets = header['offsets']
+
+        shape = (self.__sweep_count, self.__sweep_point_count, self.__channel_count)
+
+        if self.__sweep_point_count == 0:
+            self.__raw = np.zeros(shape=shape, dtype=self.dtype)
+        else:
+            self.__raw = np.memmap(
+                self.__path,
+                dtype=self.dtype,
+                mode='r',
+                offset=self.__data_byte_start,
+                shape=shape)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def path(self):
+        """
+        The file path of the ABF file
+        """
+        return self.__path
+
+    @property
+    def version(self):
+        """
+        The major ABF version (1 or 2)
+        """
+        return self.__version
+
+    @property
+    def dtype(self):
+        """
+        The on-disk sample type (int16 or float32)
+        """
+        return ABF_DTYPES[self.__data_format]
+
+    @property
+    def is_scaled(self):
+        """
+        True if the raw samples are ADC counts that need gains/offsets applied
+        """
+        return self.dtype == np.int16
+
+    @property
+    def channel_count(self):
+        return self.__channel_count
+
+    @property
+    def sweep_count(self):
+        return self.__sweep_count
+
+    @property
+    def sweep_point_count(self):
+        return self.__sweep_point_count
+
+    @property
+    def sample_rate(self):
+        """
+        The per-channel sample rate (Hz)
+        """
+        return self.__sample_rate
+
+    @property
+    def adc_names(self):
+        return self.__adc_names
+
+    @property
+    def adc_units(self):
+        return self.__adc_units
+
+    @property
+    def gains(self):
+        """
+        Per-channel multiplier from ADC counts to physical units
+        """
+        return np.array(self.__gains)
+
+    @property
+    def offsets(self):
+        """
+        Per-channel offset (applied after the gain) in physical units
+        """
+        return np.array(self.__offsets)
+
+    @property
+    def data_byte_start(self):
+        return self.__data_byte_start
+
+    @property
+    def raw(self):
+        """
+        The raw samples as a read-only memmap (sweeps x samples x channels)
+        """
+        return self.__raw
+
+    def channel(self, channel):
+        """
+        Strided view of the raw samples of one channel
+        @param channel: the channel index
+        @return read-only array (sweeps x samples)
+        """
+        return self.__raw[:, :, channel]
+
+    def sweep(self, sweep, channel=None):
+        """
+        View of the raw samples of one sweep
+        @param sweep: the sweep index
+        @param channel: the channel index
+            defaults to all channels
+        @return read-only array (samples x channels), or (samples) for one channel
+        """
+        if channel is None:
+            return self.__raw[sweep]
+
+        return self.__raw[sweep, :, channel]
+
+    def read(self, start=0, stop=None, channels=None):
+        """
+        Reads and scales a block of sweeps
+        @param start: first sweep to read
+        @param stop: one past the last sweep to read
+            defaults to sweep_count
+        @param channels: list of channel indices
+            defaults to all channels
+        @return float32 array (sweeps x samples x channels) in physical units
+        """
+        if stop is None:
+            stop = self.sweep_count
+
+        if channels is None:
+            channels = range(self.channel_count)
+
+        channels = list(channels)
+        sweeps = len(range(self.sweep_count)[start:stop])
+        block = np.empty(shape=(sweeps, self.sweep_point_count, len(channels)), dtype=np.float32)
+
+        for ix, c in enumerate(channels):
+            block[:, :, ix] = self.scale(self.channel(c)[start:stop], c)
+
+        return block
+
+    def scale(self, raw, channel):
+        """
+        Converts raw samples of one channel to physical units
+        @param raw: array of raw samples (e.g. a slice of channel())
+        @param channel: the channel index
+        @return float32 array
+        """
+        values = np.asarray(raw).astype(np.float32)
+
+        if self.is_scaled:
+            values = np.multiply(values, self.__gains[channel], out=values)
+            values = np.add(values, self.__offsets[channel], out=values)
+
+        return values
+
+    def close(self):
+        """
+        Releases the memory map
+        """
+        self.__raw = None
+
+
+class ABFHeader(namedtuple('ABFHeader', [
+    'abfFilePath', 'abfDateTime', 'protocolPath', 'sweepCount', 'sweepPointCount', 'dataRate',
+    'channelList', 'adcNames', 'nADCNum', 'nWaveformSource', 'lDACFilePath', 'nEpochType'])):
+    """
+    The few ABF header fields used by hive.report.abfstats.ABFReporter
+
+    Fields are named (and derived) as in pyabf.ABF: the channel fields are
+    in sampling sequence order; nWaveformSource and lDACFilePath have one
+    entry per DAC; nEpochType has one entry per defined (DAC, epoch).
+    """
+    __slots__ = ()
+
+
+def read_abf_header(abf_file):
+    """
+    Reads the header fields of an ABF1 or ABF2 file needed for reporting
+    Only the ABF1 header, or the ABF2 section map and the protocol, ADC, DAC,
+    epoch-per-DAC and strings sections are read: a few KB per file, where
+    pyabf.ABF(loadData=False) parses every section.
+    @param abf_file: the ABF file path
+    @return ABFHeader
+    """
+    header = _read_header(os.path.abspath(abf_file))
+
+    # like pyabf, protocol paths that are not .pro files read "None"
+    protocol_path = header['protocol_path']
+
+    if not protocol_path.endswith('.pro'):
+        protocol_path = 'None'
+
+    return ABFHeader(
+        abfFilePath=header['path'],
+        abfDateTime=header['date'],
+        protocolPath=protocol_path,
+        sweepCount=header['sweep_count'],
+        sweepPointCount=header['sweep_point_count'],
+        dataRate=header['data_rate'],
+        channelList=list(range(len(header['adc_num']))),
+        adcNames=header['adc_names'],
+        nADCNum=header['adc_num'],
+        nWaveformSource=header['waveform_source'],
+        lDACFilePath=header['dac_file_path'],
+        nEpochType=header['epoch_types'])
+
+
+def _read_header(path):
+    # Reads the header fields of an ABF1 or ABF2 file (for both ABFMap and
+    # read_abf_header()), applying pyabf's fix-ups: gap-free files have a
+    # single sweep, and empty channel names and units read "?"
+    # @param path: the ABF file path
+    # @return dict of field name => value
+    with open(path, 'rb') as fb:
+        signature = fb.read(4)
+
+        if signature == b'ABF2':
+            header = _read_header_v2(fb, path)
+        elif signature == b'ABF ':
+            header = _read_header_v1(fb, path)
+        else:
+            raise ABFFormatError(f'invalid ABF file format: {path}')
+
+    if header['operation_mode'] == 3 or header['sweep_count'] == 0:
+        header['sweep_count'] = 1
+
+    header['sweep_point_count'] = int(header['data_point_count'] / header['sweep_count'] / len(header['adc_num']))
+    header['adc_names'] = [name if name else '?' for name in header['adc_names']]
+    header['adc_units'] = [unit if unit else '?' for unit in header['adc_units']]
+
+    return header
+
+
+def _read_header_v1(fb, path):
+    # NOTE: the ABF1 header spans 6 KB, but short files may end sooner
+    fb.seek(0)
+    header = fb.read(ABF1_HEADER_SIZE).ljust(ABF1_HEADER_SIZE, b'\x00')
+
+    channel_count = _unpack('<h', header, 120)
+    sampling_seq = _unpack('<16h', header, 410)[:channel_count]
+    names = _unpack('<' + '10s' * 16, header, 442)
+    units = _unpack('<' + '8s' * 16, header, 602)
+
+    # like pyabf, files without a start date are dated by their creation time
+    start_date = _unpack('<i', header, 20)
+
+    if start_date == 0:
+        date = datetime.fromtimestamp(round(os.path.getctime(path)))
+    else:
+        date = _parse_date(start_date, timedelta(
+            seconds=_unpack('<i', header, 24),
+            milliseconds=_unpack('<h', header, 366)))
+
+    gains, offsets = _scale_factors(
+        sampling_seq,
+        adc_range=_unpack('<f', header, 244),
+        adc_resolution=_unpack('<i', header, 252),
+        programmable_gain=_unpack('<16f', header, 730),
+        scale_factor=_unpack('<16f', header, 922),
+        instrument_offset=_unpack('<16f', header, 986),
+        signal_gain=_unpack('<16f', header, 1050),
+        signal_offset=_unpack('<16f', header, 1114),
+        telegraph_enable=_unpack('<16h', header, 4512),
+        telegraph_gain=_unpack('<16f', header, 4576))
+
+    return {
+        'version': 1,
+        'path': path,
+        'date': date,
+        'protocol_path': _decode(_unpack('<256s', header, 4898)),
+        'operation_mode': _unpack('<h', header, 8),
+        'sweep_count': _unpack('<i', header, 16),
+        'data_point_count': _unpack('<i', header, 10),
+        'data_format': _unpack('<h', header, 100),
+        'data_byte_start': _unpack('<i', header, 40) * ABF_BLOCK_SIZE + _unpack('<h', header, 14),
+        'data_rate': int(1e6 / _unpack('<f', header, 122) / channel_count),
+        'adc_names': [_decode(names[i]) for i in sampling_seq],
+        'adc_units': [_decode(units[i]) for i in sampling_seq],
+        'adc_num': list(sampling_seq),
+        'gains': gains,
+        'offsets': offsets,
+        'waveform_source': list(_unpack('<2h', header, 2300)),
+        'dac_file_path': [_decode(p) for p in _unpack('<256s256s', header, 2736)],
+        # 2 DACs x 10 epochs: keep the defined (non-disabled) epochs
+        'epoch_types': [t for t in _unpack('<20h', header, 2308) if t != 0]
+    }
+
+
+def _read_header_v2(fb, path):
+    sections = read_section_map(fb)
+
+    fb.seek(0)
+    header = fb.read(ABF_BLOCK_SIZE)
+
+    strings = _read_indexed_strings(fb, sections['strings'])
+
+    def string(index):
+        return strings[index] if 0 <= index < len(strings) else ''
+
+    date = _parse_date(_unpack('<I', header, 16), timedelta(seconds=_unpack('<I', header, 20) / 1000))
+
+    protocol = sections['protocol']
+    fb.seek(protocol.byte_start)
+    buffer = fb.read(protocol.entry_size)
+
+    adc = sections['adc']
+
+    def adc_entries(fmt, offset):
+        return _read_entries(fb, adc, fmt, offset)
+
+    # NOTE: the ADC section is already in sampling sequence order
+    gains, offsets = _scale_factors(
+        range(adc.entry_count),
+        adc_range=_unpack('<f', buffer, 110),
+        adc_resolution=_unpack('<i', buffer, 118),
+        programmable_gain=adc_entries('<f', 28),
+        scale_factor=adc_entries('<f', 40),
+        instrument_offset=adc_entries('<f', 44),
+        signal_gain=adc_entries('<f', 48),
+        signal_offset=adc_entries('<f', 52),
+        telegraph_enable=adc_entries('<h', 2),
+        telegraph_gain=adc_entries('<f', 6))
+
+    return {
+        'version': 2,
+        'path': path,
+        'date': date,
+        'protocol_path': string(_unpack('<I', header, 72)),
+        'operation_mode': _unpack('<h', buffer, 0),
+        'sweep_count': _unpack('<I', header, 12),
+        'data_point_count': sections['data'].entry_count,
+        'data_format': _unpack('<H', header, 30),
+        'data_byte_start': sections['data'].byte_start,
+        'data_rate': int(1e6 / _unpack('<f', buffer, 2)),
+        'adc_names': [string(i) for i in adc_entries('<i', 74)],
+        'adc_units': [string(i) for i in adc_entries('<i', 78)],
+        'adc_num': adc_entries('<h', 0),
+        'gains': gains,
+        'offsets': offsets,
+        'waveform_source': _read_entries(fb, sections['dac'], '<h', 42),
+        'dac_file_path': [string(i) for i in _read_entries(fb, sections['dac'], '<i', 118)],
+        'epoch_types': _read_entries(fb, sections['epochPerDac'], '<h', 4)
+    }
+
+
+def _scale_factors(adc_index, adc_range, adc_resolution, programmable_gain, scale_factor,
+                   instrument_offset, signal_gain, signal_offset, telegraph_enable, telegraph_gain):
+    # Computes the per-channel gain/offset that convert ADC counts to
+    # physical units, in the same (float64) order of operations as pyabf
+    gains = []
+    offsets = []
+
+    for i in adc_index:
+        gain = 1
+        gain /= scale_factor[i]
+        gain /= signal_gain[i]
+        gain /= programmable_gain[i]
+        if telegraph_enable[i] == 1:
+            gain /= telegraph_gain[i]
+        gain *= adc_range
+        gain /= adc_resolution
+        gains.append(gain)
+
+        offset = 0
+        offset += instrument_offset[i]
+        offset -= signal_offset[i]
+        offsets.append(offset)
+
+    return gains, offsets
+
+
+def _parse_date(start_date, start_time):
+    # Combines an ABF yyyymmdd start date and time of day, as pyabf does
+    # (an invalid date is reported as 0001-01-01)
+    try:
+        return datetime.strptime(str(start_date), '%Y%m%d') + start_time
+    except ValueError:
+        return datetime(1, 1, 1)
@@ -0,0 +1,154 @@
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Reader for H5 files written by hive.convert.abf2h5.ABFConverter
+"""
+
+import h5py
+import numpy as np
+
+
+class ScaledDataset:
+    """
+    Lazily scaled view of a raw (ADC count) /data dataset
+
+    Indexing reads only the requested raw samples and converts them to
+    physical units: value = raw * gain + offset, with one gain/offset per
+    channel (axis 1). The arithmetic is done in float32, as pyabf does, so
+    values are identical to those in a float-mode output file.
+    """
+
+    def __init__(self, dataset, gains, offsets, dtype=np.float64):
+        """
+        Constructs a new ScaledDataset
+        @param dataset: the raw h5py.Dataset (samples x channels x sweeps)
+        @param gains: per-channel gains
+        @param offsets: per-channel offsets
+        @param dtype: the type of the returned values
+        """
+        self.__dataset = dataset
+        self.__gains = np.asarray(gains, dtype=np.float32).reshape(1, -1, 1)
+        self.__offsets = np.asarray(offsets, dtype=np.float32).reshape(1, -1, 1)
+        self.__dtype = np.dtype(dtype)
+
+    @property
+    def dataset(self):
+        """
+        The underlying raw h5py.Dataset
+        """
+        return self.__dataset
+
+    @property
+    def shape(self):
+        return self.__dataset.shape
+
+    @property
+    def dtype(self):
+        return self.__dtype
+
+    def __len__(self):
+        return len(self.__dataset)
+
+    def __getitem__(self, key):
+        raw = self.__dataset[key]
+
+        # index the (broadcast) scale factors the same way as the data
+        gains = np.broadcast_to(self.__gains, self.shape)[key]
+        offsets = np.broadcast_to(self.__offsets, self.shape)[key]
+
+        values = np.multiply(np.asarray(raw, dtype=np.float32), gains)
+        values = np.add(values, offsets)
+
+        return values.astype(self.__dtype)
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[()]
+        return values if dtype is None else values.astype(dtype)
+
+
+class ABFH5Reader:
+    """
+    Reads converted ABF files, in either float or raw storage mode
+    """
+
+    def __init__(self, h5_file, dtype=np.float64, chunk_cache_size=None, chunk_cache_slots=None):
+        """
+        Constructs a new ABFH5Reader
+        @param h5_file: the H5 file path
+        @param dtype: the type of values returned by data
+            (raw storage mode only; float mode returns the stored values)
+        @param chunk_cache_size: size in bytes of the HDF5 raw chunk cache per dataset
+            defaults to the HDF5 default (1 MB)
+        @param chunk_cache_slots: number of chunk cache hash slots (ideally a prime
+            ~100x the number of chunks that fit in the cache)
+            defaults to the HDF5 default
+        """
+        self.__file = h5py.File(
+            h5_file, 'r',
+            rdcc_nbytes=chunk_cache_size,
+            rdcc_nslots=chunk_cache_slots)
+        self.__dtype = dtype
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def file(self):
+        """
+        The open h5py.File
+        """
+        return self.__file
+
+    @property
+    def header(self):
+        """
+        The header attributes as a dict
+        """
+        return dict(self.__file['header'].attrs)
+
+    @property
+    def is_raw(self):
+        """
+        True if /data holds raw ADC counts
+        """
+        return 'dataGain' in self.__file['header'].attrs
+
+    @property
+    def channel_names(self):
+        return list(self.__file['header'].attrs['recChNames'])
+
+    @property
+    def sweep_times(self):
+        return self.__file['header/sweepTimes'][()]
+
+    @property
+    def raw(self):
+        """
+        The stored /data dataset (samples x channels x sweeps)
+        """
+        return self.__file['data']
+
+    @property
+    def data(self):
+        """
+        The data in physical units (samples x channels x sweeps)
+        Returns a lazily scaled view in raw mode and the dataset itself otherwise.
+        """
+        if not self.is_raw:
+            return self.raw
+
+        attrs = self.__file['header'].attrs
+
+        return ScaledDataset(
+            self.raw,
+            attrs['dataGain'],
+            attrs['dataOffset'],
+            dtype=self.__dtype)
+
+    def close(self):
+        self.__file.close()
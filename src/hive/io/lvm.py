@@ -0,0 +1,291 @@
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Parsing of LabVIEW measurement (LVM) text files
+"""
+
+import io
+import itertools
+import re
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+# the line that ends the file header and each segment header
+LVM_HEADER_END = '***End_of_Header***'
+
+# text encoding of LVM headers (LabVIEW writes the Windows code page)
+LVM_ENCODING = 'latin-1'
+
+# data parse engines
+#   c:       pandas' C parser
+#   pyarrow: pyarrow's multi-threaded CSV reader (requires pyarrow)
+#   numpy:   numpy.loadtxt() into a fixed-dtype array
+LVM_ENGINES = ['c', 'pyarrow', 'numpy']
+
+# H5 output layouts (written by hive.convert.lvm2h5.LVMConverter)
+#   tables: a (channel, frame, time, Y_Value) table per channel under data/chNNN
+#   values: a 1-D array of the values of each channel under data/chNNN; the frame
+#           is the (zero-based) array index and time is implicit (X0 + frame * Delta_X + offset)
+#   matrix: one chunked (n_frames x n_channels) /data dataset plus an
+#           (n_segments x n_channels) /offset array; time is implicit
+# NOTE: hive.io.lvmh5.LVMH5Reader reads all of them (and rebuilds implicit times)
+LVM_LAYOUTS = ['tables', 'values', 'matrix']
+
+# the segment index column of each channel's time offset in that segment,
+# e.g. offset_ch000 (the header table's offset is that of segment 0)
+SEGMENT_OFFSET_COLUMN = 'offset_ch{:03d}'
+
+# read buffer size: must hold at least one data row
+LVM_BUFFER_SIZE = 1 << 20
+
+# the first characters of a data row (numbers, NaN, Inf): any other line starts a segment header
+_DATA_ROW_START = b'-+.0123456789NI'
+_HEADER_LINE = re.compile(rb'\n[^-+.0-9NI]')
+
+
+def split_fields(line):
+    """
+    Splits one line of an LVM file into its tab-separated fields
+    @param line: the line (with or without its line ending), as str or bytes
+    @return list of strings
+    """
+    if isinstance(line, bytes):
+        line = line.decode(LVM_ENCODING)
+
+    return line.rstrip('\r\n').split('\t')
+
+
+def read_header(fh):
+    """
+    Reads one LVM header block (the file header or a segment header), up to
+    and including its ***End_of_Header*** line
+    @param fh: the LVM file opened for (text or binary) reading, positioned at the
+        start of the block
+    @return dict of row label => list of values (one per column; blank lines are skipped),
+        or None at the end of the file
+    """
+    header = {}
+
+    while True:
+        line = fh.readline()
+
+        if not line and not header:
+            return None
+
+        if not line:
+            raise ValueError(f'{getattr(fh, "name", "LVM file")}: missing {LVM_HEADER_END}')
+
+        fields = split_fields(line)
+
+        if fields[0] == LVM_HEADER_END:
+            return header
+
+        if fields[0]:
+            header[fields[0]] = fields[1:]
+
+
+class SegmentReader(io.RawIOBase):
+    """
+    Binary stream over the data rows of one LVM segment
+
+    Reads the underlying file up to (not including) the first line that is not
+    a data row, i.e. the header of the next segment, so a parser can consume
+    the stream to its end and leave the file positioned at that header.
+    """
+
+    def __init__(self, fh):
+        """
+        Constructs a new SegmentReader
+        @param fh: the LVM file opened for buffered binary reading (e.g. open(..., 'rb')),
+            positioned at the first data row of a segment
+        """
+        self.__fh = fh
+        self.__done = False
+        self.__line_start = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.__done:
+            return 0
+
+        chunk = self.__fh.peek(len(buffer))[:len(buffer)]
+
+        if not chunk:
+            self.__done = True
+            return 0
+
+        # a header starts at the beginning of the chunk (if that is a line start)
+        # or right after a line ending within it
+        if self.__line_start and chunk[0] not in _DATA_ROW_START:
+            end = 0
+        else:
+            match = _HEADER_LINE.search(chunk)
+            end = None if match is None else match.start() + 1
+
+        if end is not None:
+            self.__done = True
+            chunk = chunk[:end]
+
+        size = len(chunk)
+        buffer[:size] = self.__fh.read(size)
+
+        if size > 0:
+            self.__line_start = chunk.endswith(b'\n')
+
+        return size
+
+
+def open_segment(fh):
+    """
+    Opens the data rows of one LVM segment as a buffered stream (see SegmentReader)
+    @param fh: the LVM file opened for buffered binary reading, positioned at the
+        first data row of a segment
+    @return io.BufferedReader
+    """
+    return io.BufferedReader(SegmentReader(fh), buffer_size=LVM_BUFFER_SIZE)
+
+
+def parse_time(value):
+    """
+    Parses an LVM time of day, e.g. 20:40:14.6930000000000001
+    LabVIEW writes more fractional digits than a timedelta holds: like
+    dateutil, the fraction is truncated to microseconds.
+    @param value: the time string (HH:MM:SS.fraction)
+    @return timedelta since midnight
+    """
+    hours, minutes, seconds = value.strip().split(':')
+    seconds, _, fraction = seconds.partition('.')
+
+    return timedelta(
+        hours=int(hours),
+        minutes=int(minutes),
+        seconds=int(seconds),
+        microseconds=int(fraction[:6].ljust(6, '0')))
+
+
+def read_data(fh, dtypes, engine='c', block_size=None):
+    """
+    Reads the data rows of an LVM segment, block_size rows at a time
+    Only the leading len(dtypes) columns are parsed (i.e. not Comment).
+    @param fh: the LVM file (or an open_segment() stream) opened for buffered binary
+        reading, positioned at the first data row (after the column names)
+    @param dtypes: dict of column name => dtype, in column order
+    @param engine: the parser, one of LVM_ENGINES
+    @param block_size: the number of rows per block
+        defaults to None (all rows in one block)
+        NOTE: the pyarrow engine sizes its blocks in bytes, estimated from the first row
+    @return generator of DataFrame blocks (one empty block if there are no rows)
+    """
+    dtypes = {name: np.dtype(dt) for name, dt in dtypes.items()}
+
+    if engine == 'c':
+        return _read_data_c(fh, dtypes, block_size)
+
+    if engine == 'pyarrow':
+        return _read_data_pyarrow(fh, dtypes, block_size)
+
+    if engine == 'numpy':
+        return _read_data_numpy(fh, dtypes, block_size)
+
+    raise ValueError(f'unknown engine [{engine}]: expected one of {LVM_ENGINES}')
+
+
+def _empty_block(dtypes):
+    # the block of a segment without data rows
+    return pd.DataFrame({name: np.empty(0, dtype=dt) for name, dt in dtypes.items()})
+
+
+def _read_data_c(fh, dtypes, block_size):
+    reader = pd.read_csv(
+        fh,
+        sep='\t',
+        header=None,
+        names=list(dtypes),
+        usecols=range(len(dtypes)),
+        dtype=dtypes,
+        chunksize=block_size)
+
+    if block_size is None:
+        yield reader
+        return
+
+    with reader:
+        yield from reader
+
+
+def _read_data_pyarrow(fh, dtypes, block_size):
+    # NOTE: pyarrow needs every row to have the same number of fields, but the
+    # Comment field may be on some rows only: read each row as one string field
+    # (split on a control character rows do not contain) and split off the
+    # leading len(dtypes) fields with pyarrow.compute
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv
+
+    first = fh.peek(LVM_BUFFER_SIZE).split(b'\n', 1)[0]
+
+    if not first.strip():
+        yield _empty_block(dtypes)
+        return
+
+    read_options = csv.ReadOptions(column_names=['row'], use_threads=True)
+    parse_options = csv.ParseOptions(delimiter='\x1f', quote_char=False)
+    convert_options = csv.ConvertOptions(column_types={'row': pa.string()})
+
+    def to_frame(rows):
+        fields = pc.split_pattern(rows, '\t', max_splits=len(dtypes))
+
+        return pa.table({
+            name: pc.list_element(fields, ix).cast(pa.from_numpy_dtype(dt))
+            for ix, (name, dt) in enumerate(dtypes.items())
+        }).to_pandas()
+
+    if block_size is None:
+        yield to_frame(csv.read_csv(
+            fh,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=convert_options).column('row'))
+        return
+
+    read_options.block_size = max(block_size * (len(first) + 1), 1 << 16)
+
+    reader = csv.open_csv(
+        fh,
+        read_options=read_options,
+        parse_options=parse_options,
+        convert_options=convert_options)
+
+    for batch in reader:
+        yield to_frame(batch.column('row'))
+
+
+def _read_data_numpy(fh, dtypes, block_size):
+    for block in itertools.count():
+        lines = list(itertools.islice(fh, block_size))
+
+        if not lines:
+            if block == 0:
+                yield _empty_block(dtypes)
+            return
+
+        values = np.loadtxt(
+            lines,
+            delimiter='\t',
+            usecols=range(len(dtypes)),
+            dtype=np.float64,
+            ndmin=2)
+
+        yield pd.DataFrame({
+            name: values[:, ix].astype(dt, copy=False)
+            for ix, (name, dt) in enumerate(dtypes.items())
+        })
+
+        if block_size is None:
+            return
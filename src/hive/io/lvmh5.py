@@ -0,0 +1,317 @@
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Reader for H5 files written by hive.convert.lvm2h5.LVMConverter
+"""
+
+import h5py
+import numpy as np
+import pandas as pd
+import tables
+
+from hive.io.lvm import SEGMENT_OFFSET_COLUMN
+
+# tolerance (in frames) when locating a time: times are rebuilt in floating point
+_FRAME_TOLERANCE = 1e-6
+
+
+class LVMH5Reader:
+    """
+    Reads converted LVM files, in any of the LVMConverter layouts
+
+    The values and matrix layouts store no time column: times are rebuilt from
+    the segment index, as
+        time = X0 + (frame - first frame of the segment) * Delta_X + offset
+    with the X0, Delta_X and channel offset of each frame's segment, which
+    matches the time column of the tables layout to the precision of the LVM
+    text (X_Value is written with a limited number of digits).
+    """
+
+    def __init__(self, h5_file):
+        """
+        Constructs a new LVMH5Reader
+        @param h5_file: the H5 file path
+        """
+        self.__store = pd.HDFStore(h5_file, mode='r')
+        self.__header = self.__store['header']
+        self.__segments = self.__read_segments()
+        self.__offsets = self.__segments[
+            [SEGMENT_OFFSET_COLUMN.format(ch) for ch in self.__header['channel']]
+        ].to_numpy(dtype=np.float64)
+
+        # the matrix /data is a plain array, not a group of channels; values layout
+        # channels are plain arrays too (pandas tables, before LVMConverter 1.2)
+        node = self.__store.get_node(self.__key(0))
+        self.__arrays = node is None or not isinstance(node, tables.Group)
+
+        if node is None:
+            self.__layout = 'matrix'
+        elif self.__arrays:
+            self.__layout = 'values'
+        else:
+            columns = self.__store.get_storer(self.__key(0)).table.colnames
+            self.__layout = 'tables' if 'time' in columns else 'values'
+
+        # arrays are read with h5py, which (unlike PyTables) has the lzf filter
+        self.__file = h5py.File(h5_file, 'r') if self.__arrays else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def store(self):
+        """
+        The open pandas.HDFStore
+        """
+        return self.__store
+
+    @property
+    def header(self):
+        """
+        The channel table (one row per channel)
+        """
+        return self.__header
+
+    @property
+    def segments(self):
+        """
+        The segment index (one row per LVM segment)
+        """
+        return self.__segments
+
+    @property
+    def offsets(self):
+        """
+        The (segments x channels) channel time offsets (seconds)
+        """
+        return self.__offsets
+
+    @property
+    def layout(self):
+        """
+        The output layout, one of hive.io.lvm.LVM_LAYOUTS
+        """
+        return self.__layout
+
+    @property
+    def data(self):
+        """
+        The (frames x channels) h5py.Dataset of the matrix layout, else None
+        """
+        return self.__file['data'] if self.layout == 'matrix' else None
+
+    @property
+    def channel_names(self):
+        return list(self.__header['name'])
+
+    @property
+    def frame_count(self):
+        """
+        The number of frames (rows) per channel
+        """
+        return int(self.__segments['rows'].sum())
+
+    def time(self, channel=None, start=None, stop=None):
+        """
+        Rebuilds the times of a range of frames of one channel
+        @param channel: the channel number
+            defaults to None (the X_Value times, without any channel offset)
+        @param start: the first (zero-based) frame, defaults to 0
+        @param stop: the frame after the last, defaults to frame_count
+        @return float64 ndarray of times (seconds)
+        """
+        if channel is not None:
+            channel = self.channel_numbers([channel])[0]
+
+        frames = np.arange(*slice(start, stop).indices(self.frame_count))
+
+        first = self.__segments['frame'].to_numpy()
+        ix = np.searchsorted(first, frames, side='right') - 1
+
+        x0 = self.__segments['X0'].to_numpy(dtype=np.float64)[ix]
+        delta_x = self.__segments['Delta_X'].to_numpy(dtype=np.float64)[ix]
+
+        offset = 0.0 if channel is None else self.__offsets[ix, channel]
+
+        return x0 + (frames - first[ix]) * delta_x + offset
+
+    def frames(self, t0=None, t1=None):
+        """
+        Locates the frames whose X_Value times fall within [t0, t1]
+        Computed from the segment index alone (no data is read), which assumes
+        that times increase across segments, as LabVIEW writes them.
+        @param t0: the start time (seconds), defaults to None (the first frame)
+        @param t1: the end time (seconds, inclusive), defaults to None (the last frame)
+        @return (start, stop) zero-based frame range
+        """
+        start = 0 if t0 is None else self.__count_frames(t0, 'left')
+        stop = self.frame_count if t1 is None else self.__count_frames(t1, 'right')
+
+        return start, max(start, stop)
+
+    def channel_numbers(self, channels=None):
+        """
+        Resolves channels to channel numbers
+        @param channels: list of channel numbers and/or names, defaults to None (all)
+        @return list of channel numbers
+        @raise ValueError: for an unknown channel name or number
+        """
+        if channels is None:
+            return list(self.__header['channel'])
+
+        names = self.channel_names
+
+        try:
+            numbers = [names.index(ch) if isinstance(ch, str) else int(ch) for ch in channels]
+        except ValueError as e:
+            raise ValueError(f'unknown channel in {channels}: expected one of {names}') from e
+
+        if any(not 0 <= ch < len(names) for ch in numbers):
+            raise ValueError(f'unknown channel in {channels}: expected 0-{len(names) - 1} or one of {names}')
+
+        return numbers
+
+    def values(self, channel, start=None, stop=None):
+        """
+        Reads the values of a range of frames of one channel
+        @param channel: the channel number
+        @param start: the first (zero-based) frame, defaults to 0
+        @param stop: the frame after the last, defaults to frame_count
+        @return ndarray of values (of the stored type)
+        """
+        channel = self.channel_numbers([channel])[0]
+
+        if self.layout == 'matrix':
+            return self.data[start:stop, channel]
+
+        if self.__arrays:
+            return self.__file[self.__key(channel)][start:stop]
+
+        return self.__store.select(self.__key(channel), start=start, stop=stop, columns=['Y_Value'])['Y_Value'].to_numpy()
+
+    def matrix(self, channels=None, start=None, stop=None):
+        """
+        Reads a range of frames of several channels
+        @param channels: list of channel numbers, defaults to None (all)
+        @param start: the first (zero-based) frame, defaults to 0
+        @param stop: the frame after the last, defaults to frame_count
+        @return (frames x channels) ndarray
+        """
+        channels = self.channel_numbers(channels)
+
+        if not channels:
+            frames = len(range(*slice(start, stop).indices(self.frame_count)))
+            dtype = self.data.dtype if self.layout == 'matrix' else self.values(0, 0, 0).dtype
+            return np.empty((frames, 0), dtype=dtype)
+
+        if self.layout == 'matrix':
+            # one read of the row range: chunks span all channels
+            return self.data[start:stop][:, channels]
+
+        return np.column_stack([self.values(ch, start, stop) for ch in channels])
+
+    def channel(self, channel, start=None, stop=None):
+        """
+        Reads a range of frames of one channel as a tables layout table
+        @param channel: the channel number
+        @param start: the first (zero-based) frame, defaults to 0
+        @param stop: the frame after the last, defaults to frame_count
+        @return DataFrame of (channel, frame, time, Y_Value), indexed by (zero-based) frame
+        """
+        channel = self.channel_numbers([channel])[0]
+
+        if self.layout == 'tables':
+            return self.__store.select(self.__key(channel), start=start, stop=stop)
+
+        index = pd.RangeIndex(*slice(start, stop).indices(self.frame_count))
+
+        return pd.DataFrame({
+            'channel': np.full(len(index), channel, dtype=np.int64),
+            'frame': np.asarray(index + 1, dtype=np.int64),
+            'time': self.time(channel, start, stop),
+            'Y_Value': self.values(channel, start, stop)
+        }, index=index)
+
+    def close(self):
+        self.__store.close()
+
+        if self.__file is not None:
+            self.__file.close()
+
+    def __read_segments(self):
+        # Files converted before segments were indexed hold a single segment:
+        # describe it from the channel table
+        if '/segments' in self.__store.keys():
+            segments = self.__store['segments']
+        else:
+            segments = pd.DataFrame({
+                'segment': [0],
+                'frame': [0],
+                'rows': [int(self.__header['Samples'][0])],
+                'start': [self.__header['start'].min()],
+                'X0': [self.__header['X0'][0]],
+                'Delta_X': [self.__header['Delta_X'][0]]
+            })
+
+        # files converted before per-segment offsets were recorded (LVMConverter
+        # version < 1.1) only hold segment 0's, in the channel table
+        for ch, offset in zip(self.__header['channel'], self.__header['offset']):
+            column = SEGMENT_OFFSET_COLUMN.format(ch)
+
+            if column not in segments:
+                segments[column] = offset
+
+        return segments
+
+    def __count_frames(self, t, side):
+        # Counts the frames with times before t ('left') or up to t ('right'),
+        # by arithmetic on each segment's X0/Delta_X
+        x0 = self.__segments['X0'].to_numpy(dtype=np.float64)
+        delta_x = self.__segments['Delta_X'].to_numpy(dtype=np.float64)
+        rows = self.__segments['rows'].to_numpy()
+
+        k = (t - x0) / delta_x
+
+        if side == 'left':
+            count = np.ceil(k - _FRAME_TOLERANCE)
+        else:
+            count = np.floor(k + _FRAME_TOLERANCE) + 1
+
+        return int(np.clip(count, 0, rows).sum())
+
+    @staticmethod
+    def __key(channel):
+        return f'data/ch{channel:03d}'
+
+
+def read_lvm_h5(h5_file, channels=None, t0=None, t1=None, as_array=False):
+    """
+    Reads a time window of some channels of a converted LVM file
+    Only the frames in the window are read (located with LVMH5Reader.frames()),
+    from any of the LVMConverter layouts.
+    @param h5_file: the H5 file path
+    @param channels: list of channel numbers and/or names, defaults to None (all)
+    @param t0: the start time (seconds), defaults to None (the first frame)
+    @param t1: the end time (seconds, inclusive), defaults to None (the last frame)
+    @param as_array: if true, return an ndarray instead of a DataFrame
+    @return (frames x channels) DataFrame indexed by X_Value time (without channel
+        offsets; see LVMH5Reader.header), with one column per channel name,
+        or the ndarray of values
+    """
+    with LVMH5Reader(h5_file) as reader:
+        channels = reader.channel_numbers(channels)
+        start, stop = reader.frames(t0, t1)
+        values = reader.matrix(channels, start, stop)
+
+        if as_array:
+            return values
+
+        return pd.DataFrame(
+            values,
+            index=pd.Index(reader.time(None, start, stop), name='time'),
+            columns=[reader.channel_names[ch] for ch in channels])
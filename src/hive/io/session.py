@@ -0,0 +1,131 @@
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Session index: one H5 file whose /data is a virtual dataset spanning the
+/data of many converted ABF files along the sweep axis
+"""
+
+import os
+from datetime import datetime, time
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+# header attributes that must agree across the files of a session
+SESSION_ATTRS = ['sweepSampleCount', 'sampleFreq', 'sweepFreq', 'si', 'recChNames', 'dataGain', 'dataOffset']
+
+
+def _read_source(h5_file):
+    # Reads what the index needs from one converted ABF file
+    with h5py.File(h5_file, 'r') as f:
+        return {
+            'path': str(Path(h5_file).resolve()),
+            'attrs': dict(f['header'].attrs),
+            'sweepTimes': f['header/sweepTimes'][()],
+            'shape': f['data'].shape,
+            'dtype': f['data'].dtype
+        }
+
+
+def _same(a, b):
+    # compares attribute values (scalars or arrays)
+    return np.array_equal(np.asarray(a), np.asarray(b))
+
+
+def build_session_index(h5_files, index_file):
+    """
+    Builds a session index over converted ABF files
+    The files are ordered by recording start time. The index /data is a
+    virtual dataset (no data is copied), so the index only stays valid while
+    the source files remain at the same path relative to it.
+
+    The index header carries the shared attributes of the sources plus:
+        sweepCount: the total number of sweeps
+        abfTimestamp, recTime: those of the session (first file to end of last)
+        sourceFiles: the source paths, relative to the index file
+        sweepTimes: sweep start times (s) from the start of the session
+        sweepTimestamps: absolute sweep start times (s since the epoch)
+        sweepStartInPts: sweep start times in sample points from the start of the session
+        fileIndex: the index into sourceFiles of each sweep
+        fileSweepStart: the first (index) sweep of each source file
+
+    @param h5_files: list of H5 file paths written by ABFConverter
+    @param index_file: the index file path
+    @return the number of sweeps in the index
+    """
+    if len(h5_files) == 0:
+        raise ValueError('empty input file list')
+
+    sources = sorted(
+        [_read_source(f) for f in h5_files],
+        key=lambda s: s['attrs']['abfTimestamp'])
+
+    first = sources[0]
+
+    for source in sources[1:]:
+        if source['shape'][:2] != first['shape'][:2] or source['dtype'] != first['dtype']:
+            raise ValueError(
+                f'{source["path"]}: data {source["shape"]} {source["dtype"]} does not match '
+                f'{first["path"]}: data {first["shape"]} {first["dtype"]}')
+
+        for attr in SESSION_ATTRS:
+            if (attr in first['attrs']) != (attr in source['attrs']) or \
+                    (attr in first['attrs'] and not _same(first['attrs'][attr], source['attrs'][attr])):
+                raise ValueError(f'{source["path"]}: header attribute {attr} does not match {first["path"]}')
+
+    sweep_samples, channel_count = first['shape'][:2]
+    sweep_counts = [s['shape'][2] for s in sources]
+    sweep_count = int(sum(sweep_counts))
+    file_sweep_start = np.cumsum([0] + sweep_counts[:-1])
+
+    # NOTE: offset each file before adding its sweep times to keep sub-ms precision
+    session_start = first['attrs']['abfTimestamp']
+    sweep_times = np.concatenate(
+        [(s['attrs']['abfTimestamp'] - session_start) + s['sweepTimes'] for s in sources])
+    sweep_timestamps = session_start + sweep_times
+    file_index = np.repeat(np.arange(len(sources)), sweep_counts)
+
+    # recTime: seconds from midnight of the first recording
+    session_end = sources[-1]['attrs']['abfTimestamp'] + np.diff(sources[-1]['attrs']['recTime'])[0]
+    start_dt = datetime.fromtimestamp(session_start)
+    start_sec = (start_dt - datetime.combine(start_dt.date(), time(0, 0, 0))).total_seconds()
+    rec_time = [start_sec, start_sec + (session_end - session_start)]
+
+    index_dir = Path(index_file).resolve().parent
+    source_files = [os.path.relpath(s['path'], index_dir) for s in sources]
+
+    layout = h5py.VirtualLayout(
+        shape=(sweep_samples, channel_count, sweep_count),
+        dtype=first['dtype'])
+
+    for source, relpath, start, count in zip(sources, source_files, file_sweep_start, sweep_counts):
+        layout[:, :, start:start + count] = h5py.VirtualSource(
+            relpath, 'data', shape=source['shape'])
+
+    with h5py.File(index_file, 'w') as f:
+        hdr = f.create_group('header')
+
+        for attr in SESSION_ATTRS:
+            if attr in first['attrs']:
+                hdr.attrs[attr] = first['attrs'][attr]
+
+        hdr.attrs['sweepCount'] = sweep_count
+        hdr.attrs['abfTimestamp'] = session_start
+        hdr.attrs['recTime'] = rec_time
+        hdr.attrs['sourceFiles'] = source_files
+
+        f.create_dataset(name='header/sweepTimes', data=sweep_times, compression=5)
+        f.create_dataset(name='header/sweepTimestamps', data=sweep_timestamps, compression=5)
+        f.create_dataset(
+            name='header/sweepStartInPts',
+            data=sweep_times * first['attrs']['sampleFreq'],
+            compression=5)
+        f.create_dataset(name='header/fileIndex', data=file_index, compression=5)
+        f.create_dataset(name='header/fileSweepStart', data=file_sweep_start)
+
+        f.create_virtual_dataset('data', layout)
+
+    return sweep_count
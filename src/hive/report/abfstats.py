@@ -7,15 +7,45 @@ Reporting utility for voltammetry ABF (Axon binary format) files
 """
 
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, time
 from pathlib import Path
 from typing import List
 
-import pyabf
 from dfply import *  # @UnusedWildImport
 
+from hive.io.abf import ABFHeader, read_abf_header
+from hive.report.cache import ReportCache
+from hive.scan import scan_files
+
+# the report columns, in order
+REPORT_COLUMNS = [
+    'dir',
+    'file',
+    'date',
+    'protocol',
+    'samples',
+    'sweeps',
+    'sweepFreq_Hz',
+    'sampleFreq_kHz',
+    'recTime_sec',
+    'currentCh',
+    'currentNm',
+    'voltageCh',
+    'voltageNm',
+    'headstage',
+    'forcingFn'
+]
+
+# header reads queued per thread (bounds the headers held while streaming)
+READ_AHEAD = 4
+
 
 class ABFReporter:
+    # NOTE: bump the version when the report rows change: it invalidates cached rows
+    version = '1.0'
+
     __epoch_type = {
         0: 'disabled',
         1: 'stepped',
@@ -28,12 +58,43 @@ class ABFReporter:
         8: 'IonWorks-style ramp waveform'
     }
 
-    def __init__(self, input_path='.', file_pattern='*.abf', recurse=False):
+    def __init__(self, input_path='.', file_pattern='*.abf', recurse=False, jobs=1, cache_file=None,
+                 streaming=False, max_depth=None, prune=None, cache_max_age=None):
+        """
+        Constructs a new ABFReporter
+        @param input_path: the ABF file, or directory of ABF files
+        @param file_pattern: the glob pattern of ABF files in a directory
+        @param recurse: if true, search subdirectories
+        @param jobs: the number of threads listing directories and reading file
+            headers (both dominated by I/O latency on network file systems)
+            0 or None => the ThreadPoolExecutor default; 1 => read serially
+        @param cache_file: the SQLite file caching the rows of each file (see
+            hive.report.cache.ReportCache): only new or changed files are read
+            defaults to None (no cache)
+        @param streaming: if true, each header is discarded as soon as its rows are
+            made (abf_header_list stays empty), so memory does not grow with the
+            number of files beyond the compact row table
+        @param max_depth: the deepest subdirectory level searched when recursing
+            (0 = input_path only), defaults to None (no limit)
+        @param prune: glob patterns of directory names not to search
+            defaults to None (search every directory)
+        @param cache_max_age: if not None, after each run delete the cached rows
+            (of any reporter version) not used for cache_max_age seconds
+            defaults to None (keep every entry: other versions may share the cache)
+        """
         self.__inputPath = Path(input_path)
         self.__filePattern = file_pattern
         self.__recurse = recurse
+        self.__jobs = jobs
+        self.__cacheFile = cache_file
+        self.__cacheMaxAge = cache_max_age
+        self.__streaming = streaming
+        self.__maxDepth = max_depth
+        self.__prune = prune
+        self.__updatedDates = set()
         self.__inputFileList = []
-        self.__abfHeaderList: List[pyabf.ABF] = []
+        self.__inputStatList = []
+        self.__abfHeaderList: List[ABFHeader] = []
         self.__dataFrame = pd.DataFrame()
 
     @property
@@ -48,14 +109,53 @@ class ABFReporter:
     def file_pattern(self):
         return self.__filePattern
 
+    @property
+    def jobs(self):
+        return self.__jobs
+
+    @property
+    def cache_file(self):
+        return self.__cacheFile
+
+    @property
+    def cache_max_age(self):
+        return self.__cacheMaxAge
+
+    @property
+    def streaming(self):
+        return self.__streaming
+
+    @property
+    def max_depth(self):
+        return self.__maxDepth
+
+    @property
+    def prune(self):
+        return self.__prune
+
     @property
     def input_file_list(self):
         return self.__inputFileList
 
     @property
     def abf_header_list(self):
+        """
+        The headers read by the last process() call (not those of cached files),
+        or an empty list when streaming
+        """
         return self.__abfHeaderList
 
+    @property
+    def updated_dates(self):
+        """
+        The calendar dates of the rows of files read (not cached) by the last
+        process() call, and of the rows previously cached for those files (the
+        days they moved from), e.g. the partitions to rewrite in an incremental report
+        NOTE: files deleted since they were cached are not noticed: their rows
+        stay in the partitions of their days until the report is fully rewritten
+        """
+        return self.__updatedDates
+
     @property
     def data_frame(self):
         return self.__dataFrame
@@ -67,44 +167,60 @@ class ABFReporter:
             raise FileNotFoundError(input_path)
 
         if input_path.is_dir():
-            if self.recurse:
-                file_list = sorted(
-                    list(input_path.glob('**/' + self.file_pattern)),
-                    key=lambda f: os.path.getmtime(f))
-            else:
-                file_list = sorted(
-                    list(input_path.glob(self.file_pattern)),
-                    key=lambda f: os.path.getmtime(f))
+            # one scandir pass: each file's stat (mtime order, cache key) comes from its DirEntry
+            scanned = scan_files(
+                input_path,
+                self.file_pattern,
+                recurse=self.recurse,
+                max_depth=self.max_depth,
+                prune=self.prune,
+                jobs=self.jobs)
+
+            self.__inputFileList = [Path(f.path) for f in scanned]
+            self.__inputStatList = [f.stat for f in scanned]
         else:
-            file_list = [self.input_path]
+            self.__inputFileList = [self.input_path]
+            self.__inputStatList = [None]
 
-        self.__inputFileList = file_list
+    def __read_abf_headers(self, file_list):
+        # Generator of the headers of file_list, in order (so the report order
+        # is unchanged); threads read at most READ_AHEAD headers each ahead
+        if self.jobs == 1:
+            for file in file_list:
+                yield self.__read_abf(file)
+            return
 
-    def __read_abf_headers(self):
-        abf_header_list = [
-            self.__read_abf(file, False)
-            for file in self.input_file_list
-        ]
+        workers = self.jobs or min(32, (os.cpu_count() or 1) + 4)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+
+            for file in file_list:
+                pending.append(executor.submit(self.__read_abf, file))
 
-        self.__abfHeaderList = abf_header_list
+                if len(pending) >= workers * READ_AHEAD:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
 
     @staticmethod
-    def __read_abf(file, load_data=False):
+    def __read_abf(file):
+        # reads only the header fields the report needs (see hive.io.abf.ABFHeader)
         try:
-            abf = pyabf.ABF(str(file), loadData=load_data)
+            abf = read_abf_header(file)
         except Exception as e:
             print(f'*** {repr(e)} while reading {file}')
             abf = None
 
         return abf
 
-    def __make_row(self, abf: pyabf.ABF, ch: int):
+    def __make_row(self, abf: ABFHeader, ch: int):
         # dir/file
         abf_path = Path(abf.abfFilePath.replace('\\', '/'))
 
         try:
-            # noinspection PyProtectedMember
-            current_ch = abf._adcSection.nADCNum[ch]
+            current_ch = abf.nADCNum[ch]
 
             sweep_count = abf.sweepCount
             sweep_samples = abf.sweepPointCount
@@ -125,26 +241,23 @@ class ABFReporter:
             protocol_path = Path(abf.protocolPath.replace('\\', '/'))
 
             # voltageCh
-            if current_ch + 1 <= max(abf._adcSection.nADCNum):
-                voltage_ch = abf._adcSection.nADCNum[ch + 1]
+            if current_ch + 1 <= max(abf.nADCNum):
+                voltage_ch = abf.nADCNum[ch + 1]
                 voltage_name = abf.adcNames[ch + 1]
             else:
                 voltage_ch = -1
                 voltage_name = ''
 
             dac_ch = int(ch / 2)
-            # noinspection PyProtectedMember
-            wave_src = abf._dacSection.nWaveformSource[dac_ch]
+            wave_src = abf.nWaveformSource[dac_ch]
 
             if wave_src == 2:  # ABF_DACFILEWAVEFORM
-                # noinspection PyProtectedMember
-                forcing_fn = Path(abf._stringsIndexed.lDACFilePath[dac_ch].replace('\\', '/')).name
+                forcing_fn = Path(abf.lDACFilePath[dac_ch].replace('\\', '/')).name
             elif wave_src == 1:  # ABF_EPOCHTABLEWAVEFORM
                 #
                 # TODO: investigate possible bug?
                 #
-                # noinspection PyProtectedMember
-                epoch_types = abf._epochPerDacSection.nEpochType
+                epoch_types = abf.nEpochType
 
                 if len(epoch_types) == 0:
                     forcing_fn = f''
@@ -192,24 +305,103 @@ class ABFReporter:
                 "forcingFn": pd.NA
             }
 
-    def __make_row_list(self):
-        self.__row_list = [
+    def __make_file_rows(self, abf: ABFHeader):
+        return [
             self.__make_row(abf, ch)
-            for abf in self.__abfHeaderList if abf
             for ch in abf.channelList if ch % 2 == 0 and "fscv" in abf.adcNames[ch].lower()
         ]
 
-    def process(self):
+    def __make_row_list(self, cache=None, sink=None):
+        file_list = self.input_file_list
+        keys = [
+            self.__cache_key(file, stat_result) if cache else None
+            for file, stat_result in zip(file_list, self.__inputStatList)
+        ]
+        cached = [self.__from_cache(cache.get(key)) if key else None for key in keys]
 
+        # read only the files that are not cached, in file list order
+        abf_headers = self.__read_abf_headers([file for file, rows in zip(file_list, cached) if rows is None])
+
+        self.__abfHeaderList = []
+        self.__updatedDates = set()
+
+        # the compact row table: one tuple of REPORT_COLUMNS values per row
+        self.__row_list = []
+
+        for key, rows in zip(keys, cached):
+            if rows is None:
+                abf = next(abf_headers)
+
+                if not self.streaming:
+                    self.__abfHeaderList.append(abf)
+
+                # unreadable files are not cached: they are retried (and reported) next time
+                if not abf:
+                    continue
+
+                rows = self.__make_file_rows(abf)
+                self.__updatedDates.update(row['date'].date() for row in rows)
+
+                if key:
+                    # a changed file's rows may have moved from other days
+                    previous = self.__from_cache(cache.previous(key[0])) or []
+                    self.__updatedDates.update(row['date'].date() for row in previous)
+
+                    cache.put(key, rows)
+
+            if sink is not None and rows:
+                sink.write(rows)
+
+            self.__row_list.extend(tuple(row[column] for column in REPORT_COLUMNS) for row in rows)
+
+    @staticmethod
+    def __from_cache(rows):
+        # Restores the values of cached rows (stored as JSON: see ReportCache.get)
+        if rows is None:
+            return None
+
+        for row in rows:
+            for column, value in row.items():
+                if value is None:
+                    row[column] = pd.NA
+
+            row['date'] = datetime.fromisoformat(row['date'])
+
+        return rows
+
+    @staticmethod
+    def __cache_key(file, stat_result):
+        try:
+            return ReportCache.key(file, stat_result)
+        except OSError:
+            # reported when the file is read
+            return None
+
+    def process(self, sink=None):
+        """
+        Builds the report (data_frame)
+        @param sink: receives the rows of each file as they are made, before the
+            report is sorted (e.g. hive.report.sinks.CSVRowSink)
+            any object with a write(rows) method taking a list of row dicts
+        @return self
+        """
         self.__build_file_list()
-        self.__read_abf_headers()
-        self.__make_row_list()
+
+        if self.cache_file is None:
+            self.__make_row_list(sink=sink)
+        else:
+            with ReportCache(self.cache_file, self.version) as cache:
+                self.__make_row_list(cache, sink)
+                cache.flush()
+
+                if self.cache_max_age is not None:
+                    cache.prune(self.cache_max_age)
 
         if len(self.__row_list) == 0:
             df = pd.DataFrame()
         else:
             df = (
-                    pd.DataFrame(self.__row_list) >>
+                    pd.DataFrame.from_records(self.__row_list, columns=REPORT_COLUMNS) >>
                     select(
                         X.dir,
                         X.file,
@@ -230,5 +422,6 @@ class ABFReporter:
             )
 
         self.__dataFrame = df
+        self.__row_list = []
 
         return self
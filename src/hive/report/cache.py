@@ -0,0 +1,192 @@
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+On-disk (SQLite) cache of report rows, keyed by file path, size and times
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+
+# seconds to wait for another process holding the database lock
+CACHE_TIMEOUT = 60
+
+# the layout of the report_rows table (older cache files are emptied and rebuilt)
+_SCHEMA_VERSION = 2
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS report_rows (
+    path TEXT NOT NULL,
+    version TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ctime_ns INTEGER NOT NULL,
+    used REAL NOT NULL,
+    rows TEXT NOT NULL,
+    PRIMARY KEY (path, version)
+)
+'''
+
+
+def _to_json(value):
+    # json.dumps() default: ISO dates, and null for missing values (pd.NA)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return value.item()
+
+    return None
+
+
+class ReportCache:
+    """
+    Cache of the report rows extracted from each file
+
+    An entry is valid while the file keeps the size, mtime and ctime it had
+    when it was read (the ctime also changes when a file is replaced with one
+    of the same size and mtime, and dates files that have no recording date),
+    and only for the reporter version that wrote it.
+
+    Rows are stored as JSON: dates as ISO strings and missing values as nulls
+    (see get()).
+
+    Several processes may share one cache file, including different reporter
+    versions, whose entries are kept apart: the database is used in WAL mode
+    (readers never block the writer) and writers wait up to CACHE_TIMEOUT
+    seconds for the lock. Entries of old versions are only deleted by prune().
+    NOTE: SQLite locking is unreliable on network file systems, so keep the
+    cache file on a local disk.
+    """
+
+    def __init__(self, db_file, version):
+        """
+        Constructs a new ReportCache
+        @param db_file: the SQLite database file (created if it does not exist)
+        @param version: the reporter version; entries of other versions are ignored
+        """
+        self.__version = str(version)
+        self.__pending = []
+        self.__used = []
+        self.__db = sqlite3.connect(str(db_file), timeout=CACHE_TIMEOUT)
+
+        with self.__db:
+            self.__db.execute('PRAGMA journal_mode=WAL')
+
+            if self.__db.execute('PRAGMA user_version').fetchone()[0] != _SCHEMA_VERSION:
+                self.__db.execute('DROP TABLE IF EXISTS report_rows')
+                self.__db.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+
+            self.__db.execute(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def version(self):
+        return self.__version
+
+    @staticmethod
+    def key(file, stat_result=None):
+        """
+        The cache key of a file
+        @param file: the file path
+        @param stat_result: the file's os.stat_result, if already known
+        @return (absolute path, size, mtime_ns, ctime_ns)
+        """
+        if stat_result is None:
+            stat_result = os.stat(file)
+
+        return os.path.abspath(file), stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ctime_ns
+
+    def get(self, key):
+        """
+        Looks up the cached rows of a file
+        @param key: the file's cache key (see key())
+        @return list of row dicts (with dates as ISO strings and missing values
+            as None), or None if the file is not cached (or has changed)
+        """
+        path, size, mtime_ns, ctime_ns = key
+
+        found = self.__db.execute(
+            'SELECT rows FROM report_rows '
+            'WHERE path = ? AND version = ? AND size = ? AND mtime_ns = ? AND ctime_ns = ?',
+            (path, self.__version, size, mtime_ns, ctime_ns)).fetchone()
+
+        if found is None:
+            return None
+
+        self.__used.append(path)
+        return json.loads(found[0])
+
+    def previous(self, path):
+        """
+        Looks up the rows last cached for a file, whether or not it has changed since
+        @param path: the file path
+        @return list of row dicts (as get()), or None if the file was never cached
+        """
+        found = self.__db.execute(
+            'SELECT rows FROM report_rows WHERE path = ? AND version = ?',
+            (os.path.abspath(path), self.__version)).fetchone()
+
+        return None if found is None else json.loads(found[0])
+
+    def put(self, key, rows):
+        """
+        Caches the rows of a file (written by flush())
+        @param key: the file's cache key (see key())
+        @param rows: list of row dicts of JSON values, dates, numpy scalars
+            and missing values (None or pd.NA)
+        """
+        path, size, mtime_ns, ctime_ns = key
+        self.__pending.append((path, self.__version, size, mtime_ns, ctime_ns, json.dumps(rows, default=_to_json)))
+
+    def flush(self):
+        """
+        Writes the cached rows, and marks the entries read as used, in one transaction
+        """
+        if not self.__pending and not self.__used:
+            return
+
+        now = time.time()
+
+        with self.__db:
+            self.__db.executemany(
+                'INSERT OR REPLACE INTO report_rows (path, version, size, mtime_ns, ctime_ns, used, rows) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(*entry[:5], now, entry[5]) for entry in self.__pending])
+
+            self.__db.executemany(
+                'UPDATE report_rows SET used = ? WHERE path = ? AND version = ?',
+                [(now, path, self.__version) for path in self.__used])
+
+        self.__pending = []
+        self.__used = []
+
+    def prune(self, max_age=None):
+        """
+        Deletes stale entries
+        @param max_age: if not None, delete the entries (of any version) not read
+            or written for max_age seconds, so versions still in use keep theirs
+            defaults to None (delete every entry of other reporter versions)
+        @return the number of entries deleted
+        """
+        with self.__db:
+            if max_age is None:
+                cursor = self.__db.execute('DELETE FROM report_rows WHERE version != ?', (self.__version,))
+            else:
+                cursor = self.__db.execute('DELETE FROM report_rows WHERE used < ?', (time.time() - max_age,))
+
+        return cursor.rowcount
+
+    def close(self):
+        self.flush()
+        self.__db.close()
@@ -0,0 +1,241 @@
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Writers for report rows (see hive.report.abfstats.ABFReporter.process) and
+for complete report tables, as CSV or as typed Parquet/Feather files
+"""
+
+import os
+import shutil
+import uuid
+
+import pandas as pd
+
+# report output formats (parquet and feather require pyarrow)
+REPORT_FORMATS = ['csv', 'parquet', 'feather']
+
+# file extensions of each report format
+REPORT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather'
+}
+
+# the partition column of date-partitioned reports (the calendar day of date)
+PARTITION_COLUMN = 'day'
+
+
+class CSVRowSink:
+    """
+    Appends report rows to a CSV file as they are made
+
+    Rows arrive in file order, before the report is sorted: the file holds
+    the rows of every file read so far (e.g. to watch a long scan), and is
+    normally replaced by the sorted report when the scan completes.
+    """
+
+    def __init__(self, csv_file, columns, float_format='%0.1f'):
+        """
+        Constructs a new CSVRowSink (the file is truncated)
+        @param csv_file: the CSV file path
+        @param columns: the column names, in order
+        @param float_format: the format of floating point values
+        """
+        self.__columns = list(columns)
+        self.__float_format = float_format
+        self.__file = open(csv_file, 'w', newline='')
+        self.__row_count = 0
+
+        pd.DataFrame(columns=self.__columns).to_csv(self.__file, index=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def row_count(self):
+        """
+        The number of rows written
+        """
+        return self.__row_count
+
+    def write(self, rows):
+        """
+        Appends rows
+        @param rows: list of row dicts
+        """
+        pd.DataFrame(rows, columns=self.__columns).to_csv(
+            self.__file,
+            header=False,
+            index=False,
+            float_format=self.__float_format)
+
+        self.__file.flush()
+        self.__row_count += len(rows)
+
+    def close(self):
+        self.__file.close()
+
+
+def report_schema():
+    """
+    The Arrow schema of Parquet/Feather reports
+    Channel numbers are integers, protocol and forcingFn are categorical
+    (dictionary encoded) and missing values are nulls.
+    @return pyarrow.Schema
+    """
+    import pyarrow as pa
+
+    category = pa.dictionary(pa.int32(), pa.string())
+
+    return pa.schema([
+        ('dir', pa.string()),
+        ('file', pa.string()),
+        ('date', pa.timestamp('us')),
+        ('protocol', category),
+        ('samples', pa.int64()),
+        ('sweeps', pa.int64()),
+        ('sweepFreq_Hz', pa.float64()),
+        ('sampleFreq_kHz', pa.float64()),
+        ('recTime_sec', pa.float64()),
+        ('currentCh', pa.int32()),
+        ('currentNm', pa.string()),
+        ('voltageCh', pa.int32()),
+        ('voltageNm', pa.string()),
+        ('headstage', pa.int32()),
+        ('forcingFn', category)
+    ])
+
+
+def to_arrow(df):
+    """
+    Converts a report to an Arrow table with the report_schema()
+    @param df: the report DataFrame (e.g. ABFReporter.data_frame)
+    @return pyarrow.Table
+    """
+    import pyarrow as pa
+
+    schema = report_schema()
+
+    if df.empty:
+        return schema.empty_table()
+
+    columns = []
+
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            array = pa.array(df[field.name], type=field.type.value_type, from_pandas=True)
+            array = array.dictionary_encode()
+        else:
+            array = pa.array(df[field.name], type=field.type, from_pandas=True)
+
+        columns.append(array)
+
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def resolve_format(path, report_format=None):
+    """
+    Resolves the format of a report file
+    @param path: the output path
+    @param report_format: one of REPORT_FORMATS
+        defaults to None (from the path's extension, else csv)
+    @return one of REPORT_FORMATS
+    """
+    if report_format is None:
+        report_format = REPORT_EXTENSIONS.get(os.path.splitext(str(path))[1].lower(), 'csv')
+
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f'unknown report format [{report_format}]: expected one of {REPORT_FORMATS}')
+
+    return report_format
+
+
+def write_report(df, path, report_format=None, partition=False, dates=None, rewrite=False):
+    """
+    Writes a report
+    @param df: the report DataFrame (e.g. ABFReporter.data_frame)
+    @param path: the output file, or dataset directory when partitioning
+    @param report_format: one of REPORT_FORMATS
+        defaults to None (from the path's extension, else csv)
+    @param partition: if true (parquet/feather only), write a dataset directory
+        with one partition (subdirectory day=YYYY-MM-DD) per calendar day of
+        date; partitions of other days already in the directory are kept
+    @param dates: when partitioning, the days (datetime.date) to (re)write,
+        e.g. ABFReporter.updated_dates; defaults to None (every day in df)
+        NOTE: a day without rows in df is emptied (e.g. its files moved to
+        another day), but days not listed keep their rows, including those of
+        files deleted since they were written: rewrite to drop them
+    @param rewrite: when partitioning, replace the whole dataset with df
+        (partitions of days not in df are deleted; dates is ignored)
+    @return the number of rows written
+    """
+    report_format = resolve_format(path, report_format)
+
+    if report_format == 'csv':
+        if partition:
+            raise ValueError('CSV reports cannot be partitioned')
+
+        df.to_csv(path, float_format='%0.1f', index=False)
+        return len(df)
+
+    table = to_arrow(df)
+
+    if partition:
+        return _write_partitions(table, path, report_format, None if rewrite else dates, rewrite)
+
+    if report_format == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, path)
+
+    return table.num_rows
+
+
+def _write_partitions(table, path, report_format, dates, rewrite=False):
+    # Replaces the partitions of the given days with the rows of those days,
+    # in new (uniquely named) files; partitions of given days without rows are
+    # deleted, and when rewriting, so are those of every day not in the table
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    table = table.append_column(PARTITION_COLUMN, pc.cast(table['date'], pa.date32()))
+
+    if dates is not None:
+        table = table.filter(pc.is_in(table[PARTITION_COLUMN], value_set=pa.array(sorted(dates), pa.date32())))
+
+    def partition_names(days):
+        return {f'{PARTITION_COLUMN}={day}' for day in days}
+
+    written = partition_names(pc.unique(table[PARTITION_COLUMN]).to_pylist())
+    emptied = partition_names(dates or [])
+
+    if os.path.isdir(path):
+        for entry in os.scandir(path):
+            if entry.name in written or not entry.name.startswith(f'{PARTITION_COLUMN}='):
+                continue
+
+            if rewrite or entry.name in emptied:
+                shutil.rmtree(entry.path)
+
+    if table.num_rows == 0:
+        return 0
+
+    ds.write_dataset(
+        table,
+        path,
+        format=report_format,
+        partitioning=ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.date32())]), flavor='hive'),
+        basename_template=f'report-{uuid.uuid4().hex}-{{i}}.{report_format}',
+        existing_data_behavior='delete_matching')
+
+    return table.num_rows
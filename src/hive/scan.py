@@ -0,0 +1,105 @@
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Discovery of input files in directory trees, built on os.scandir()
+"""
+
+import fnmatch
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+ScannedFile = namedtuple('ScannedFile', ['path', 'stat'])
+ScannedFile.__doc__ = '''
+A file found by scan_files(): its path and os.stat_result
+'''
+
+
+def scan_files(input_path, file_pattern='*', recurse=False, max_depth=None, prune=None, jobs=1):
+    """
+    Lists the files matching a pattern in a directory (tree), oldest first
+
+    Each file is stat'ed once, through its os.DirEntry (whose type information
+    also avoids stat'ing directories), and the stat result is returned with
+    the path, so callers need not stat the file again.
+    Symbolic links to directories are not followed.
+    @param input_path: the directory to search, or a single file (returned as is)
+    @param file_pattern: the glob pattern of file names to match
+    @param recurse: if true, search subdirectories
+    @param max_depth: the deepest subdirectory level to search (0 = input_path only)
+        defaults to None (no limit); only used when recurse is true
+    @param prune: glob patterns of directory names not to descend into
+        defaults to None (search every directory)
+    @param jobs: the number of threads listing directories (subtrees are listed in parallel)
+        0 or None => the ThreadPoolExecutor default; 1 => list serially
+    @return list of ScannedFile, sorted by modification time (then path)
+    """
+    input_path = os.fspath(input_path)
+
+    if not os.path.isdir(input_path):
+        return [ScannedFile(input_path, os.stat(input_path))]
+
+    if not recurse:
+        max_depth = 0
+
+    prune = list(prune or [])
+
+    def scan(directory):
+        # lists one directory: (matching files, subdirectories to search)
+        files = []
+        subdirectories = []
+
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if not any(fnmatch.fnmatch(entry.name, p) for p in prune):
+                        subdirectories.append(entry.path)
+                elif fnmatch.fnmatch(entry.name, file_pattern) and entry.is_file():
+                    files.append(ScannedFile(entry.path, entry.stat()))
+
+        return files, subdirectories
+
+    found = []
+    level = [input_path]
+    depth = 0
+
+    # breadth first: every directory of a level is listed before the next level
+    with ThreadPoolExecutor(max_workers=jobs or None) as executor:
+        while level:
+            listings = map(scan, level) if jobs == 1 else executor.map(scan, level)
+            level = []
+
+            for files, subdirectories in listings:
+                found.extend(files)
+                level.extend(subdirectories)
+
+            depth += 1
+
+            if max_depth is not None and depth > max_depth:
+                break
+
+    return sorted(found, key=lambda f: (f.stat.st_mtime, f.path))
+
+
+def expand_paths(paths, file_pattern='*', recurse=False, jobs=1):
+    """
+    Expands directories in a list of input paths to the files they contain
+    (e.g. the positional arguments of the converter CLIs)
+    @param paths: file and/or directory paths
+    @param file_pattern: the glob pattern of file names to match in directories
+    @param recurse: if true, search subdirectories
+    @param jobs: the number of threads listing directories (see scan_files())
+    @return list of file paths: files as given, each directory replaced by its
+        matching files (oldest first)
+    """
+    expanded = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            expanded.extend(f.path for f in scan_files(path, file_pattern, recurse, jobs=jobs))
+        else:
+            expanded.append(path)
+
+    return expanded
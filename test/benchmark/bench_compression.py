@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Benchmarks the compression presets of both converters on synthetic ABF and
+LVM files: write speed (MB of uncompressed output data per second of
+conversion), read-back speed and compression ratio
+
+usage: bench_compression.py WORK_DIR [SWEEPS [LVM_ROWS [LVM_CHANNELS]]]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import h5py
+import numpy as np
+import pandas as pd
+from pyabf.abfWriter import writeABF1
+
+# write_lvm is shared with bench_lvm_read, next to this file
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_lvm_read import write_lvm  # noqa: E402
+from hive.convert.abf2h5 import ABFConverter
+from hive.convert.base import COMPRESSION_PRESETS
+from hive.convert.lvm2h5 import LVM_LAYOUTS, LVMConverter
+from hive.io.abfh5 import ABFH5Reader
+
+
+def write_abf(path, sweeps, samples=1000, rate=100000):
+    # Writes a single-channel ABF1 file of noisy FSCV-like sweeps
+    t = np.linspace(0, 1, samples)
+    rng = np.random.default_rng(0)
+    data = 500 * np.sin(2 * np.pi * 4 * t) * np.exp(-3 * t) + rng.normal(scale=5, size=(sweeps, samples))
+
+    writeABF1(data.astype(np.float32), str(path), rate, units='nA')
+
+    # writeABF1 leaves the channel name empty (NUL-filled): name it
+    with open(path, 'r+b') as fb:
+        fb.seek(442)
+        fb.write(b'FSCV_1'.ljust(10))
+
+
+def report(name, preset, data_bytes, file, write_time, read_time):
+    print(f'{name:>12} {preset:>8}: '
+          f'write {data_bytes / 1e6 / write_time:7.1f} MB/s  '
+          f'read {data_bytes / 1e6 / read_time:7.1f} MB/s  '
+          f'ratio {data_bytes / os.path.getsize(file):5.2f}', flush=True)
+
+
+def bench_abf(work_dir, sweeps):
+    abf_file = work_dir / 'bench.abf'
+
+    if not abf_file.exists():
+        write_abf(abf_file, sweeps)
+
+    for preset in COMPRESSION_PRESETS:
+        out = work_dir / f'abf_{preset}.h5'
+
+        start_time = time.time()
+        ABFConverter(str(abf_file), str(out), compression=preset).process()
+        write_time = time.time() - start_time
+
+        start_time = time.time()
+        with ABFH5Reader(str(out)) as reader:
+            data = reader.data[()]
+        read_time = time.time() - start_time
+
+        report('abf', preset, data.nbytes, out, write_time, read_time)
+
+
+def bench_lvm(work_dir, rows, channels):
+    lvm_file = work_dir / 'bench.lvm'
+
+    if not lvm_file.exists():
+        write_lvm(lvm_file, rows, channels)
+
+    for layout in LVM_LAYOUTS:
+        for preset in COMPRESSION_PRESETS:
+            out = work_dir / f'lvm_{layout}_{preset}.h5'
+
+            start_time = time.time()
+            LVMConverter(str(lvm_file), str(out), block_size=100000, layout=layout, compression=preset).process()
+            write_time = time.time() - start_time
+
+            start_time = time.time()
+            if layout == 'tables':
+                data_bytes = sum(
+                    pd.read_hdf(out, f'data/ch{chan:03d}').memory_usage(index=False).sum()
+                    for chan in range(channels))
+            elif layout == 'values':
+                with h5py.File(out, 'r') as f:
+                    data_bytes = sum(f[f'data/ch{chan:03d}'][()].nbytes for chan in range(channels))
+            else:
+                with h5py.File(out, 'r') as f:
+                    data_bytes = f['data'][()].nbytes
+            read_time = time.time() - start_time
+
+            report(f'lvm {layout}', preset, data_bytes, out, write_time, read_time)
+
+
+def main(work_dir, sweeps=6000, lvm_rows=500000, lvm_channels=16):
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    bench_abf(work_dir, sweeps)
+    bench_lvm(work_dir, lvm_rows, lvm_channels)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], *[int(arg) for arg in sys.argv[2:]])
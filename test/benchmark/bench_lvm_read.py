@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Created on Oct 17, 2026
+
+@author: jwhite
+
+Benchmarks the LVM data parse engines (hive.io.lvm.read_data) on a synthetic
+LVM file, which is written first if it does not exist
+
+usage: bench_lvm_read.py FILE.lvm [ROWS [CHANNELS [BLOCK_SIZE]]]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from hive.io.lvm import LVM_ENGINES, read_data, read_header, split_fields
+
+
+def write_lvm(path, rows, channels, delta_x=0.001):
+    # Writes a single-segment LVM file of random samples
+    def header_row(label, values):
+        return '\t'.join([label] + [str(v) for v in values] + ['', '']) + '\n'
+
+    rng = np.random.default_rng(0)
+
+    with open(path, 'w', newline='') as f:
+        f.write('LabVIEW Measurement\t\nWriter_Version\t2\nReader_Version\t2\nSeparator\tTab\n'
+                'Decimal_Separator\t.\nMulti_Headings\tNo\nX_Columns\tOne\nTime_Pref\tAbsolute\n'
+                'Date\t2018/09/06\nTime\t20:40:14.6930000000000001\n***End_of_Header***\t\n\t\n')
+        f.write(header_row('Channels', [channels]))
+        f.write(header_row('Samples', [rows] * channels))
+        f.write(header_row('Date', ['2018/09/06'] * channels))
+        f.write(header_row('Time', ['20:40:14.6930000000000001'] * channels))
+        f.write(header_row('Y_Unit_Label', ['Volts'] * channels))
+        f.write(header_row('X_Dimension', ['Time'] * channels))
+        f.write(header_row('X0', ['0.0000000000000000E+0'] * channels))
+        f.write(header_row('Delta_X', [f'{delta_x:f}'] * channels))
+        f.write('***End_of_Header***\t\n')
+        f.write('\t'.join(['X_Value'] + [f'Input {i}' for i in range(channels)] + ['Comment']) + '\n')
+
+        for start in range(0, rows, 100000):
+            n = min(100000, rows - start)
+            x = np.arange(start, start + n)[:, None] * delta_x
+            y = rng.normal(scale=0.01, size=(n, channels))
+            np.savetxt(f, np.hstack([x, y]), fmt='%.6f', delimiter='\t')
+
+
+def main(path, rows=3000000, channels=64, block_size=100000):
+    if not os.path.exists(path):
+        print(f'writing {path}: {rows} rows x {channels} channels', flush=True)
+        write_lvm(path, rows, channels)
+
+    size_mb = os.path.getsize(path) / 1e6
+    print(f'{path}: {size_mb:.0f} MB, block size {block_size} rows')
+
+    for engine in LVM_ENGINES:
+        for dtype in ['float64', 'float32']:
+            with open(path, 'rb') as fh:
+                read_header(fh)
+                read_header(fh)
+                columns = split_fields(fh.readline())
+
+                dtypes = {name: dtype for name in columns[:-1]}
+                dtypes['X_Value'] = 'float64'
+
+                start_time = time.time()
+                count = sum(len(block) for block in read_data(fh, dtypes, engine, block_size))
+                elapsed = time.time() - start_time
+
+            print(f'{engine:>8} {dtype}: {count} rows in {elapsed:.1f} s '
+                  f'({size_mb / elapsed:.1f} MB/s)', flush=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], *[int(arg) for arg in sys.argv[2:]])
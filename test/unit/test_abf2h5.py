@@ -0,0 +1,245 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import h5py
+import numpy as np
+import pyabf
+import pytest
+from pyabf.abfWriter import writeABF1
+
+from hive.convert.abf2h5 import CHECKPOINT_ATTR, CHUNK_TARGET_SIZE, ABFConverter, chunk_shape
+from hive.io.abf import ABFMap
+
+
+class ChunkShapeTest(unittest.TestCase):
+    shape = (1032, 4, 60000)
+
+    def test_auto(self):
+        assert chunk_shape('auto', self.shape, 8) is None
+        assert chunk_shape(None, self.shape, 8) is None
+
+    def test_per_sweep(self):
+        assert chunk_shape('per-sweep', self.shape, 8) == (1032, 1, 1)
+
+    def test_per_channel_block(self):
+        chunks = chunk_shape('per-channel-block', self.shape, 8)
+        assert chunks[:2] == (1032, 1)
+        assert chunks[2] == CHUNK_TARGET_SIZE // (1032 * 8)
+
+    def test_time_major(self):
+        chunks = chunk_shape('time-major', self.shape, 2)
+        assert chunks[:2] == (1032, 4)
+        assert chunks[2] == CHUNK_TARGET_SIZE // (1032 * 4 * 2)
+
+    def test_block_limited_by_sweeps(self):
+        assert chunk_shape('time-major', (1032, 4, 3), 8) == (1032, 4, 3)
+
+    def test_explicit(self):
+        assert chunk_shape([100, 2, 5], self.shape, 8) == (100, 2, 5)
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            chunk_shape('bogus', self.shape, 8)
+
+
+def write_abf(path, sweeps=10, seed=0):
+    # Writes a single-channel FSCV ABF1 file
+    data = np.random.default_rng(seed).normal(size=(sweeps, 1000)) * 100
+    writeABF1(data, str(path), 20000, units='nA')
+
+    # writeABF1 leaves the channel name empty (NUL-filled): name it
+    with open(path, 'r+b') as fb:
+        fb.seek(442)
+        fb.write(b'FSCV_1'.ljust(10))
+
+
+def read_h5(path):
+    # the contents of a converted file: its data and header
+    with h5py.File(path, 'r') as f:
+        return {
+            'data': f['data'][()],
+            'sweepTimes': f['header/sweepTimes'][()],
+            'attrs': {k: np.asarray(v).tolist() for k, v in f['header'].attrs.items()},
+            'checkpoint': CHECKPOINT_ATTR in f.attrs
+        }
+
+
+# a 2-channel (3 sweeps x 200 samples) int16 ABF2 file with non-unit gains/offsets
+ABF2_FILE = str(Path(__file__).parent / 'data' / 'fscv_abf2.abf')
+
+
+def pyabf_data(path, channels=None):
+    # pyabf's values of an ABF file, in the /data layout (samples x channels x sweeps)
+    abf = pyabf.ABF(path)
+
+    if channels is None:
+        channels = abf.channelList
+
+    return np.stack([abf.data[ch].reshape(abf.sweepCount, abf.sweepPointCount).T for ch in channels], axis=1)
+
+
+class ConverterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.abf_file = str(self.dir / 'test.abf')
+        write_abf(self.abf_file)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def convert(self, abf_file, **kwargs):
+        h5_file = str(self.dir / 'out.h5')
+        ABFConverter(abf_file, h5_file, **kwargs).process()
+        return read_h5(h5_file)
+
+    def test_block_size(self):
+        # block-streamed output (including blocks that do not divide the sweep
+        # count) equals the whole-file conversion and pyabf's data
+        for abf_file, block_sizes in [(self.abf_file, [1, 3, 4, 10, 25]), (ABF2_FILE, [1, 2])]:
+            whole = self.convert(abf_file)
+            np.testing.assert_array_equal(whole['data'], pyabf_data(abf_file))
+            assert whole['data'].dtype == np.float64
+
+            for block_size in block_sizes:
+                blocks = self.convert(abf_file, block_size=block_size)
+
+                np.testing.assert_array_equal(blocks['data'], whole['data'])
+                np.testing.assert_array_equal(blocks['sweepTimes'], whole['sweepTimes'])
+                assert blocks['attrs'] == whole['attrs']
+
+    def test_default_chunks(self):
+        # the default layout keeps the legacy chunking: h5py's guess for the whole
+        # float64 array, written with gzip 5
+        expected = pyabf_data(self.abf_file).astype(np.float64)
+
+        with h5py.File(str(self.dir / 'legacy.h5'), 'w') as f:
+            legacy = f.create_dataset('data', data=expected, compression=5).chunks
+
+        for block_size in [None, 3]:
+            self.convert(self.abf_file, block_size=block_size)
+
+            with h5py.File(str(self.dir / 'out.h5'), 'r') as f:
+                assert f['data'].chunks == legacy
+
+    def test_channel_select(self):
+        # only the selected channels are decoded: by number or by ADC name, in the given order
+        for channel_select, channels in [([1], [1]), (['1'], [1]), (['Vm_1'], [1]), (['FSCV_1'], [0]),
+                                         (['Vm_1', 'FSCV_1'], [1, 0])]:
+            for block_size in [None, 2]:
+                h5 = self.convert(ABF2_FILE, channel_select=channel_select, block_size=block_size)
+
+                assert h5['data'].shape == (200, len(channels), 3)
+                np.testing.assert_array_equal(h5['data'], pyabf_data(ABF2_FILE, channels))
+                assert h5['attrs']['recChNames'] == [['FSCV_1', 'Vm_1'][ch] for ch in channels]
+
+    def test_unknown_channel(self):
+        with pytest.raises(ValueError, match='Vm_9'):
+            self.convert(ABF2_FILE, channel_select=['Vm_9'])
+
+
+class ResumeTest(unittest.TestCase):
+    # an interrupted conversion leaves a .part file with a checkpoint every block_size sweeps
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.abf_file = str(self.dir / 'test.abf')
+        self.h5_file = str(self.dir / 'test.h5')
+        self.clean_file = str(self.dir / 'clean.h5')
+        write_abf(self.abf_file)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def interrupt(self, after_blocks=2, **kwargs):
+        # Converts until after_blocks blocks (of 3 sweeps) are committed, then fails
+        calls = []
+        scale = ABFMap.scale
+
+        def failing_scale(abf_map, raw, channel):
+            if len(calls) == after_blocks:
+                raise OSError('interrupted')
+
+            calls.append(raw.shape[0])
+            return scale(abf_map, raw, channel)
+
+        converter = ABFConverter(self.abf_file, self.h5_file, block_size=3, **kwargs)
+
+        with mock.patch.object(ABFMap, 'scale', autospec=True, side_effect=failing_scale):
+            with pytest.raises(OSError):
+                converter.process()
+
+        assert not os.path.exists(self.h5_file)
+
+        with h5py.File(converter.partial_file, 'r') as f:
+            assert f.attrs[CHECKPOINT_ATTR] == 3 * after_blocks
+
+        return converter
+
+    def convert(self, **kwargs):
+        # Converts to h5_file, recording the sweeps scaled and the os.replace() calls
+        scaled = []
+        scale = ABFMap.scale
+
+        def counting_scale(abf_map, raw, channel):
+            scaled.append(raw.shape[0])
+            return scale(abf_map, raw, channel)
+
+        def checked_replace(src, dst):
+            # the output only appears, complete, through the rename
+            assert not os.path.exists(dst)
+            assert not read_h5(src)['checkpoint']
+            return os.rename(src, dst)
+
+        converter = ABFConverter(self.abf_file, self.h5_file, block_size=3, **kwargs)
+
+        with mock.patch.object(ABFMap, 'scale', autospec=True, side_effect=counting_scale), \
+                mock.patch('hive.convert.base.os.replace', side_effect=checked_replace) as replace:
+            converter.process()
+
+        replace.assert_called_once_with(converter.partial_file, self.h5_file)
+        assert not os.path.exists(converter.partial_file)
+
+        return scaled
+
+    def test_resume(self):
+        ABFConverter(self.abf_file, self.clean_file, block_size=3).process()
+        self.interrupt()
+
+        # only sweeps 6..9 are converted again
+        assert self.convert() == [3, 1]
+        assert not read_h5(self.h5_file)['checkpoint']
+
+        clean = read_h5(self.clean_file)
+        resumed = read_h5(self.h5_file)
+
+        np.testing.assert_array_equal(resumed['data'], clean['data'])
+        np.testing.assert_array_equal(resumed['sweepTimes'], clean['sweepTimes'])
+        assert resumed['attrs'] == clean['attrs']
+
+    def test_changed_settings(self):
+        self.interrupt()
+
+        # the partial file is discarded: every sweep is converted
+        assert self.convert(chunk_layout='per-sweep') == [3, 3, 3, 1]
+
+        ABFConverter(self.abf_file, self.clean_file, chunk_layout='per-sweep').process()
+        np.testing.assert_array_equal(read_h5(self.h5_file)['data'], read_h5(self.clean_file)['data'])
+
+    def test_changed_source(self):
+        self.interrupt()
+        write_abf(self.abf_file, seed=1)
+
+        assert self.convert() == [3, 3, 3, 1]
+
+        ABFConverter(self.abf_file, self.clean_file).process()
+        np.testing.assert_array_equal(read_h5(self.h5_file)['data'], read_h5(self.clean_file)['data'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+import shutil
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pyabf
+import pytest
+from pyabf.abfWriter import writeABF1
+
+from hive.io.abf import ABFFormatError, ABFMap, read_abf_header, read_section_map
+
+
+class ABFMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = str(Path(self.tmp.name) / 'test.abf')
+
+        sweeps = np.random.default_rng(0).normal(size=(12, 400)) * 100
+        writeABF1(sweeps, self.file, 20000, units='pA')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_header(self):
+        abf = pyabf.ABF(self.file, loadData=False)
+
+        with ABFMap(self.file) as abf_map:
+            assert abf_map.version == 1
+            assert abf_map.sweep_count == abf.sweepCount
+            assert abf_map.sweep_point_count == abf.sweepPointCount
+            assert abf_map.channel_count == abf.channelCount
+            assert abf_map.sample_rate == abf.dataRate
+            assert abf_map.adc_units == abf.adcUnits
+            assert abf_map.raw.shape == (12, 400, 1)
+
+    def test_read_matches_pyabf(self):
+        abf = pyabf.ABF(self.file)
+        expected = abf.data[0].reshape(abf.sweepCount, abf.sweepPointCount)
+
+        with ABFMap(self.file) as abf_map:
+            data = abf_map.read()
+            assert data.dtype == np.float32
+            assert np.array_equal(data[:, :, 0], expected)
+
+            block = abf_map.read(3, 7, [0])
+            assert np.array_equal(block[:, :, 0], expected[3:7])
+
+    def test_views(self):
+        with ABFMap(self.file) as abf_map:
+            channel = abf_map.channel(0)
+            assert channel.shape == (12, 400)
+            assert np.shares_memory(channel, abf_map.raw)
+
+            sweep = abf_map.sweep(5, 0)
+            assert sweep.shape == (400,)
+            assert np.array_equal(sweep, channel[5])
+
+    def test_invalid_file(self):
+        Path(self.file).write_bytes(b'not an ABF file')
+
+        with pytest.raises(ABFFormatError):
+            ABFMap(self.file)
+
+
+class ABFMapV2Test(unittest.TestCase):
+    # a 2-channel (3 sweeps x 200 samples) int16 ABF2 file with non-unit gains/offsets
+    file = str(Path(__file__).parent / 'data' / 'fscv_abf2.abf')
+
+    def test_header(self):
+        abf = pyabf.ABF(self.file, loadData=False)
+
+        with open(self.file, 'rb') as fb:
+            sections = read_section_map(fb)
+
+        with ABFMap(self.file) as abf_map:
+            assert abf_map.version == 2
+            assert abf_map.sweep_count == abf.sweepCount == 3
+            assert abf_map.sweep_point_count == abf.sweepPointCount == 200
+            assert abf_map.channel_count == abf.channelCount == 2
+            assert abf_map.sample_rate == abf.dataRate
+            assert abf_map.adc_names == abf.adcNames
+            assert abf_map.adc_units == abf.adcUnits
+            assert abf_map.data_byte_start == sections['data'].byte_start == abf.dataByteStart
+            assert sections['data'].entry_count == 3 * 200 * 2
+            assert abf_map.raw.shape == (3, 200, 2)
+
+    def test_read_matches_pyabf(self):
+        abf = pyabf.ABF(self.file)
+
+        with ABFMap(self.file) as abf_map:
+            data = abf_map.read()
+
+            for ch in range(abf.channelCount):
+                expected = abf.data[ch].reshape(abf.sweepCount, abf.sweepPointCount)
+                assert np.array_equal(data[:, :, ch], expected)
+
+            assert np.array_equal(abf_map.read(1, 3, [1]), data[1:3, :, [1]])
+
+    def test_bad_string_index(self):
+        # ADC name/unit string indexes out of range read as empty ("?"), in both readers
+        with tempfile.TemporaryDirectory() as tmp:
+            file = str(Path(tmp) / 'test.abf')
+            shutil.copyfile(self.file, file)
+
+            with open(file, 'r+b') as fb:
+                adc = read_section_map(fb)['adc']
+                fb.seek(adc.byte_start + 74)
+                fb.write(struct.pack('<ii', 999, -1))
+
+            with ABFMap(file) as abf_map:
+                assert abf_map.adc_names == ['?', 'Vm_1']
+                assert abf_map.adc_units == ['?', 'mV']
+
+            assert read_abf_header(file).adcNames == ['?', 'Vm_1']
+
+
+class ABFHeaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = str(Path(self.tmp.name) / 'test.abf')
+
+        sweeps = np.random.default_rng(0).normal(size=(12, 400)) * 100
+        writeABF1(sweeps, self.file, 20000, units='pA')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_pyabf(self):
+        abf = pyabf.ABF(self.file, loadData=False)
+        header = read_abf_header(self.file)
+
+        for field in ['abfFilePath', 'abfDateTime', 'protocolPath', 'sweepCount',
+                      'sweepPointCount', 'dataRate', 'channelList', 'adcNames']:
+            assert getattr(header, field) == getattr(abf, field), field
+
+        # noinspection PyProtectedMember
+        assert header.nADCNum == abf._headerV1.nADCSamplingSeq[:abf.channelCount]
+        # noinspection PyProtectedMember
+        assert header.nWaveformSource == abf._headerV1.nWaveformSource
+
+    def test_invalid_file(self):
+        Path(self.file).write_bytes(b'not an ABF file')
+
+        with pytest.raises(ABFFormatError):
+            read_abf_header(self.file)
+
+    def test_abf2_matches_pyabf(self):
+        file = ABFMapV2Test.file
+        abf = pyabf.ABF(file, loadData=False)
+        header = read_abf_header(file)
+
+        for field in ['abfFilePath', 'abfDateTime', 'protocolPath', 'sweepCount',
+                      'sweepPointCount', 'dataRate', 'channelList', 'adcNames']:
+            assert getattr(header, field) == getattr(abf, field), field
+
+        # noinspection PyProtectedMember
+        strings = abf._stringsSection._indexedStrings
+
+        # noinspection PyProtectedMember
+        assert header.nADCNum == abf._adcSection.nADCNum
+        # noinspection PyProtectedMember
+        assert header.nWaveformSource == abf._dacSection.nWaveformSource
+        # noinspection PyProtectedMember
+        assert header.lDACFilePath == [strings[i] for i in abf._dacSection.lDACFilePathIndex]
+        # noinspection PyProtectedMember
+        assert header.nEpochType == abf._epochPerDacSection.nEpochType
+        assert header.lDACFilePath == ['C:\\waves\\fscv_wave.abf']
+
+
+if __name__ == '__main__':
+    unittest.main()
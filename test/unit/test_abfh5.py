@@ -0,0 +1,109 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import h5py
+import numpy as np
+import pyabf
+from pyabf.abfWriter import writeABF1
+
+from hive.convert.abf2h5 import ABFConverter
+from hive.io.abfh5 import ABFH5Reader
+
+
+class ABFH5ReaderTest(unittest.TestCase):
+    gains = np.array([0.5, 0.25, 2.0])
+    offsets = np.array([0.0, 1.0, -3.0])
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.raw_file = str(Path(self.tmp.name) / 'raw.h5')
+        self.float_file = str(Path(self.tmp.name) / 'float.h5')
+
+        raw = np.random.default_rng(0).integers(-1000, 1000, size=(20, 3, 4)).astype(np.int16)
+        values = (
+                raw.astype(np.float32) *
+                self.gains.astype(np.float32).reshape(1, -1, 1) +
+                self.offsets.astype(np.float32).reshape(1, -1, 1))
+
+        with h5py.File(self.raw_file, 'w') as f:
+            hdr = f.create_group('header')
+            hdr.attrs['recChNames'] = ['FSCV_1', 'Cmd_1', 'TTL']
+            hdr.attrs['dataGain'] = self.gains
+            hdr.attrs['dataOffset'] = self.offsets
+            f.create_dataset(name='data', data=raw)
+
+        with h5py.File(self.float_file, 'w') as f:
+            hdr = f.create_group('header')
+            hdr.attrs['recChNames'] = ['FSCV_1', 'Cmd_1', 'TTL']
+            f.create_dataset(name='data', data=values.astype(np.float64))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_raw_matches_float(self):
+        with ABFH5Reader(self.raw_file) as raw, ABFH5Reader(self.float_file) as flt:
+            assert raw.is_raw
+            assert not flt.is_raw
+            assert raw.raw.dtype == np.int16
+            assert raw.data.shape == flt.data.shape
+            assert np.array_equal(raw.data[()], flt.data[()])
+
+    def test_raw_slicing(self):
+        with ABFH5Reader(self.raw_file) as raw, ABFH5Reader(self.float_file) as flt:
+            for key in [(slice(None), 1, slice(None)),
+                        (slice(2, 5), [0, 2], 3),
+                        (7, slice(None), slice(1, 3))]:
+                assert np.array_equal(raw.data[key], flt.data[key]), key
+
+
+
+class ABFConverterRawTest(unittest.TestCase):
+    # converted with store_raw=True, the reader's scaling reproduces the float conversion
+    abf2_file = str(Path(__file__).parent / 'data' / 'fscv_abf2.abf')
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+        self.abf1_file = str(self.dir / 'abf1.abf')
+        sweeps = np.random.default_rng(0).normal(size=(10, 1000)) * 100
+        writeABF1(sweeps, self.abf1_file, 20000, units='nA')
+
+        # writeABF1 leaves the channel name empty (NUL-filled): name it
+        with open(self.abf1_file, 'r+b') as fb:
+            fb.seek(442)
+            fb.write(b'FSCV_1'.ljust(10))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def round_trip(self, abf_file, **kwargs):
+        float_file = str(self.dir / 'float.h5')
+        raw_file = str(self.dir / 'raw.h5')
+
+        ABFConverter(abf_file, float_file, **kwargs).process()
+        ABFConverter(abf_file, raw_file, store_raw=True, **kwargs).process()
+
+        abf = pyabf.ABF(abf_file)
+
+        with ABFH5Reader(raw_file) as raw, ABFH5Reader(float_file) as flt:
+            assert raw.is_raw
+            assert raw.raw.dtype == np.int16
+            assert not flt.is_raw
+            assert np.array_equal(raw.data[()], flt.data[()])
+
+            # /data is (samples, channels, sweeps)
+            for ch in range(abf.channelCount):
+                expected = abf.data[ch].reshape(abf.sweepCount, abf.sweepPointCount).T
+                assert np.array_equal(raw.data[:, ch, :], expected)
+
+    def test_abf1(self):
+        self.round_trip(self.abf1_file)
+
+    def test_abf2_blocks(self):
+        self.round_trip(self.abf2_file, block_size=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,18 @@
+import json
+import os
+import sqlite3
+import struct
 import tempfile
 import unittest
 from pathlib import Path
 
 import pytest
 from dfply import *  # @UnusedWildImport
+from pyabf.abfWriter import writeABF1
 
-from hive.report.abfstats import ABFReporter
+from hive.report.abfstats import REPORT_COLUMNS, ABFReporter
+from hive.report.cache import ReportCache
+from hive.report.sinks import CSVRowSink, write_report
 
 
 class ReporterTest(unittest.TestCase):
@@ -157,5 +164,267 @@ class ReporterTest(unittest.TestCase):
         assert isinstance(results, pd.DataFrame), 'results should be a DataFrame'
 
 
+def write_abf_files(directory, count=6):
+    # Writes single-channel FSCV ABF1 files with increasing dates and mtimes, and one invalid file
+    sweeps = np.random.default_rng(0).normal(size=(10, 1000)) * 100
+
+    for i in range(count):
+        file = directory / f'test_{i}.abf'
+        writeABF1(sweeps, str(file), 20000, units='nA')
+
+        with open(file, 'r+b') as fb:
+            # writeABF1 leaves the recording date empty (so it would be read from
+            # the ctime): date it 2019-05-16 01:00:00 + i seconds
+            fb.seek(20)
+            fb.write(struct.pack('<ii', 20190516, 3600 + i))
+
+            # ... and the channel name empty (NUL-filled): name it
+            fb.seek(442)
+            fb.write(b'FSCV_1'.ljust(10))
+
+        os.utime(file, (i, i))
+
+    (directory / 'bad.abf').write_bytes(b'not an ABF file')
+
+
+class ReporterJobsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        write_abf_files(self.dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_jobs(self):
+        expected = ABFReporter(str(self.dir)).process().data_frame
+        assert list(expected['file']) == [f'test_{i}.abf' for i in range(6)]
+
+        for jobs in [0, 4]:
+            results = ABFReporter(str(self.dir), jobs=jobs).process().data_frame
+            pd.testing.assert_frame_equal(results, expected)
+
+    def test_prune_and_depth(self):
+        for name in ['sub', 'sub/deep', 'old']:
+            (self.dir / name).mkdir()
+            write_abf_files(self.dir / name, count=1)
+
+        def report_dirs(**kwargs):
+            results = ABFReporter(str(self.dir), recurse=True, **kwargs).process().data_frame
+            return sorted(set(results['dir']))
+
+        top = self.dir.name
+        assert report_dirs() == sorted([top, 'sub', 'deep', 'old'])
+        assert report_dirs(prune=['old']) == sorted([top, 'sub', 'deep'])
+        assert report_dirs(max_depth=1) == sorted([top, 'sub', 'old'])
+
+
+class ReporterStreamingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name) / 'data'
+        self.dir.mkdir()
+        write_abf_files(self.dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_streaming(self):
+        expected = ABFReporter(str(self.dir)).process().data_frame
+
+        for jobs in [1, 2]:
+            csv_file = Path(self.tmp.name) / 'rows.csv'
+
+            with CSVRowSink(csv_file, REPORT_COLUMNS) as sink:
+                reporter = ABFReporter(str(self.dir), jobs=jobs, streaming=True).process(sink)
+
+            pd.testing.assert_frame_equal(reporter.data_frame, expected)
+            assert reporter.abf_header_list == []
+            assert sink.row_count == 6
+
+            rows = pd.read_csv(csv_file)
+            assert list(rows.columns) == REPORT_COLUMNS
+            assert list(rows['file']) == list(expected['file'])
+
+
+class ReportOutputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name) / 'data'
+        self.dir.mkdir()
+        write_abf_files(self.dir)
+        self.report = ABFReporter(str(self.dir)).process().data_frame
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_typed_formats(self):
+        for name, read in [('report.parquet', pd.read_parquet), ('report.feather', pd.read_feather)]:
+            file = Path(self.tmp.name) / name
+            assert write_report(self.report, file) == 6
+
+            results = read(file)
+            assert list(results.columns) == REPORT_COLUMNS
+            assert results['date'].dtype.kind == 'M'
+            assert results['currentCh'].dtype == np.int32
+            assert isinstance(results['protocol'].dtype, pd.CategoricalDtype)
+            assert isinstance(results['forcingFn'].dtype, pd.CategoricalDtype)
+            assert list(results['file']) == list(self.report['file'])
+
+    def test_partitions(self):
+        dataset = Path(self.tmp.name) / 'report'
+        report = self.report.copy()
+        report.loc[3:, 'date'] = report.loc[3:, 'date'] + pd.Timedelta(days=1)
+        days = sorted(report['date'].dt.date.unique())
+
+        assert write_report(report, dataset, 'parquet', partition=True) == 6
+        assert sorted(p.name for p in dataset.iterdir()) == [f'day={d}' for d in days]
+
+        # rewriting one day replaces that partition only
+        assert write_report(report, dataset, 'parquet', partition=True, dates=[days[1]]) == 3
+        assert len(pd.read_parquet(dataset)) == 6
+
+        with pytest.raises(ValueError):
+            write_report(report, Path(self.tmp.name) / 'report.csv', partition=True)
+
+    def test_rewrite(self):
+        dataset = Path(self.tmp.name) / 'report'
+        report = self.report.copy()
+        report.loc[3:, 'date'] = report.loc[3:, 'date'] + pd.Timedelta(days=1)
+        days = sorted(report['date'].dt.date.unique())
+
+        write_report(report, dataset, 'parquet', partition=True)
+
+        # a listed day without rows is emptied
+        assert write_report(report[:3], dataset, 'parquet', partition=True, dates=days) == 3
+        assert sorted(p.name for p in dataset.iterdir()) == [f'day={days[0]}']
+
+        # rewriting drops the days not in the report
+        write_report(report, dataset, 'parquet', partition=True)
+        assert write_report(report[3:], dataset, 'parquet', partition=True, rewrite=True) == 3
+        assert sorted(p.name for p in dataset.iterdir()) == [f'day={days[1]}']
+        assert list(pd.read_parquet(dataset)['file']) == list(report['file'][3:])
+
+
+class ReporterCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name) / 'data'
+        self.dir.mkdir()
+        self.cache = Path(self.tmp.name) / 'cache.sqlite'
+        write_abf_files(self.dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cache(self):
+        expected = ABFReporter(str(self.dir)).process().data_frame
+
+        reporter = ABFReporter(str(self.dir), cache_file=self.cache).process()
+        pd.testing.assert_frame_equal(reporter.data_frame, expected)
+        assert len(reporter.abf_header_list) == 7
+        assert len(reporter.updated_dates) == 1
+
+        # only the unreadable file is read again
+        reporter = ABFReporter(str(self.dir), cache_file=self.cache).process()
+        pd.testing.assert_frame_equal(reporter.data_frame, expected)
+        assert reporter.abf_header_list == [None]
+        assert reporter.updated_dates == set()
+
+        # a changed file is read again
+        os.utime(self.dir / 'test_2.abf', (2, 2.5))
+        reporter = ABFReporter(str(self.dir), cache_file=self.cache).process()
+        pd.testing.assert_frame_equal(reporter.data_frame, expected)
+        assert len(reporter.abf_header_list) == 2
+
+    def test_moved_day(self):
+        dataset = Path(self.tmp.name) / 'report'
+
+        reporter = ABFReporter(str(self.dir), cache_file=self.cache).process()
+        write_report(reporter.data_frame, dataset, 'parquet', partition=True, dates=reporter.updated_dates)
+
+        # re-date test_5 to the next day: both days are updated
+        with open(self.dir / 'test_5.abf', 'r+b') as fb:
+            fb.seek(20)
+            fb.write(struct.pack('<i', 20190517))
+
+        reporter = ABFReporter(str(self.dir), cache_file=self.cache).process()
+        assert sorted(str(d) for d in reporter.updated_dates) == ['2019-05-16', '2019-05-17']
+
+        write_report(reporter.data_frame, dataset, 'parquet', partition=True, dates=reporter.updated_dates)
+        results = pd.read_parquet(dataset)
+        assert sorted(results['file']) == [f'test_{i}.abf' for i in range(6)]
+        assert list(results.loc[results['file'] == 'test_5.abf', 'day'].astype(str)) == ['2019-05-17']
+
+    def test_replaced_file(self):
+        ABFReporter(str(self.dir), cache_file=self.cache).process()
+
+        # a file replaced with one of the same size and mtime is read again (its ctime changed)
+        file = self.dir / 'test_2.abf'
+        stat = file.stat()
+        file.write_bytes(file.read_bytes())
+        os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        reporter = ABFReporter(str(self.dir), cache_file=self.cache).process()
+        assert [Path(abf.abfFilePath).name for abf in reporter.abf_header_list if abf] == ['test_2.abf']
+
+    def test_json_rows(self):
+        expected = ABFReporter(str(self.dir), cache_file=self.cache).process().data_frame
+
+        with sqlite3.connect(self.cache) as db:
+            rows = json.loads(db.execute("SELECT rows FROM report_rows WHERE path LIKE '%test_0.abf'").fetchone()[0])
+
+        assert rows[0]['date'] == '2019-05-16T01:00:00'
+        assert rows[0]['file'] == 'test_0.abf'
+
+        # missing values (pd.NA) are stored as null
+        with sqlite3.connect(self.cache) as db:
+            rows[0]['forcingFn'] = None
+            db.execute("UPDATE report_rows SET rows = ? WHERE path LIKE '%test_0.abf'", (json.dumps(rows),))
+
+        results = ABFReporter(str(self.dir), cache_file=self.cache).process().data_frame
+        assert pd.isna(results['forcingFn'][0])
+        pd.testing.assert_frame_equal(results.drop(columns='forcingFn'), expected.drop(columns='forcingFn'))
+
+    def test_version(self):
+        ABFReporter(str(self.dir), cache_file=self.cache).process()
+
+        class NewReporter(ABFReporter):
+            version = ABFReporter.version + '.1'
+
+        reporter = NewReporter(str(self.dir), cache_file=self.cache).process()
+        assert len(reporter.abf_header_list) == 7
+
+        # versions sharing a cache keep their own entries
+        for reporter_type in [ABFReporter, NewReporter]:
+            reporter = reporter_type(str(self.dir), cache_file=self.cache).process()
+            assert reporter.abf_header_list == [None]
+
+        # pruning by age keeps the entries still in use, of any version
+        NewReporter(str(self.dir), cache_file=self.cache, cache_max_age=3600).process()
+
+        reporter = ABFReporter(str(self.dir), cache_file=self.cache).process()
+        assert reporter.abf_header_list == [None]
+
+        with sqlite3.connect(str(self.cache)) as db:
+            db.execute('UPDATE report_rows SET used = 0 WHERE version = ?', (ABFReporter.version,))
+
+        NewReporter(str(self.dir), cache_file=self.cache, cache_max_age=3600).process()
+
+        reporter = ABFReporter(str(self.dir), cache_file=self.cache).process()
+        assert len(reporter.abf_header_list) == 7
+
+        # an explicit prune() deletes the entries of every other version
+        with ReportCache(self.cache, NewReporter.version) as cache:
+            assert cache.prune() == 6
+
+        reporter = ABFReporter(str(self.dir), cache_file=self.cache).process()
+        assert len(reporter.abf_header_list) == 7
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import pytest
+
+from hive.convert.base import FileConverter
+from hive.convert.batch import process_all, run_converter
+
+
+class SleepConverter(FileConverter):
+    # copies the input after a delay, or fails when the input is empty
+
+    def __init__(self, input_file, delay=0.0):
+        self.__delay = delay
+        super().__init__(input_file, suffix='.out')
+
+    def process(self):
+        time.sleep(self.__delay)
+        data = Path(self.input_file).read_bytes()
+
+        if not data:
+            raise ValueError(f'empty input: {self.input_file}')
+
+        Path(self.output_file).write_bytes(data)
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.files = []
+
+        for i in range(4):
+            file = self.dir / f'input_{i}.dat'
+            file.write_bytes(b'' if i == 1 else bytes([i]) * 10)
+            self.files.append(file)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def converters(self):
+        # the first conversions take longest, so they complete last
+        return [SleepConverter(str(f), delay=0.1 * (len(self.files) - i)) for i, f in enumerate(self.files)]
+
+    def check(self, results):
+        # results arrive as conversions complete: put them in input order
+        results = sorted(results, key=lambda r: r.input_file)
+        assert [r.input_file for r in results] == [str(f) for f in self.files]
+
+        # the failure is reported, and the other conversions still ran
+        assert [r.error is None for r in results] == [True, False, True, True]
+        assert 'empty input' in results[1].error
+
+        for i in [0, 2, 3]:
+            assert Path(results[i].output_file).read_bytes() == self.files[i].read_bytes()
+
+    def test_run_converter(self):
+        result = run_converter(SleepConverter(str(self.files[1])))
+
+        assert result.input_file == str(self.files[1])
+        assert 'ValueError' in result.error
+        assert result.elapsed >= 0
+
+    def test_serial(self):
+        self.check(list(process_all(self.converters(), jobs=1)))
+
+    def test_parallel(self):
+        serial = list(process_all(self.converters(), jobs=1))
+        parallel = list(process_all(self.converters(), jobs=4))
+
+        self.check(parallel)
+        assert {(r.input_file, r.output_file, r.error is None) for r in parallel} == \
+               {(r.input_file, r.output_file, r.error is None) for r in serial}
+
+    def test_slow_file(self):
+        # a slow first file does not hold back the results of the others
+        converters = [SleepConverter(str(f), delay=1.0 if i == 0 else 0.0) for i, f in enumerate(self.files)]
+        results = process_all(converters, jobs=2)
+
+        assert next(results).input_file != str(self.files[0])
+        assert len(list(results)) == len(self.files) - 1
+
+    def test_invalid_jobs(self):
+        with pytest.raises(ValueError):
+            list(process_all(self.converters(), jobs=-1))
+
+
+if __name__ == '__main__':
+    unittest.main()
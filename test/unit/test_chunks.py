@@ -0,0 +1,96 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import h5py
+import numpy as np
+import pytest
+from pyabf.abfWriter import writeABF1
+
+from hive.convert.abf2h5 import CHUNK_LAYOUTS, ABFConverter
+from hive.convert.chunks import ParallelChunkWriter
+
+
+class ParallelChunkWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = str(Path(self.tmp.name) / 'chunks.h5')
+        self.data = np.random.default_rng(0).normal(size=(100, 3, 50))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        with h5py.File(self.file, 'w') as f:
+            dset = f.create_dataset('data', shape=self.data.shape, dtype=np.float64,
+                                    chunks=(64, 2, 8), compression=5)
+
+            with ParallelChunkWriter(dset, threads=3) as writer:
+                for start in range(0, 50, 16):
+                    writer.write(self.data[:, :, start:start + 16], (0, 0, start))
+
+        with h5py.File(self.file, 'r') as f:
+            assert f['data'].compression == 'gzip'
+            assert np.array_equal(f['data'][()], self.data)
+
+    def test_unaligned(self):
+        with h5py.File(self.file, 'w') as f:
+            dset = f.create_dataset('data', shape=self.data.shape, dtype=np.float64,
+                                    chunks=(64, 2, 8), compression=5)
+
+            with ParallelChunkWriter(dset, threads=1) as writer:
+                with pytest.raises(ValueError):
+                    writer.write(self.data[:, :, 4:12], (0, 0, 4))
+
+    def test_uncompressed(self):
+        with h5py.File(self.file, 'w') as f:
+            dset = f.create_dataset('data', shape=self.data.shape, dtype=np.float64, chunks=(64, 2, 8))
+
+            with pytest.raises(ValueError):
+                ParallelChunkWriter(dset)
+
+
+class ABFConverterThreadsTest(unittest.TestCase):
+    # ABFConverter(compress_threads=...) end to end: the output equals the
+    # single-threaded conversion for every chunk layout
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+        # 300 sweeps: deeper than one chunk in every layout, and not a whole number of chunks
+        self.abf_file = str(self.dir / 'test.abf')
+        writeABF1(np.random.default_rng(0).normal(size=(300, 1000)) * 100, self.abf_file, 20000, units='nA')
+
+        with open(self.abf_file, 'r+b') as fb:
+            # writeABF1 leaves the channel name empty (NUL-filled): name it
+            fb.seek(442)
+            fb.write(b'FSCV_1'.ljust(10))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def convert(self, name, **kwargs):
+        h5_file = str(self.dir / name)
+        ABFConverter(self.abf_file, h5_file, **kwargs).process()
+
+        with h5py.File(h5_file, 'r') as f:
+            return f['data'][()], f['data'].chunks, f['data'].compression
+
+    def test_layouts(self):
+        for layout in CHUNK_LAYOUTS:
+            expected, chunks, _ = self.convert('serial.h5', chunk_layout=layout)
+
+            # block sizes that are not multiples of the chunk depth
+            for block_size in [None, 7, 50]:
+                data, threaded_chunks, compression = self.convert(
+                    'threads.h5', chunk_layout=layout, block_size=block_size, compress_threads=3)
+
+                assert threaded_chunks == chunks, (layout, block_size)
+                assert compression == 'gzip'
+                np.testing.assert_array_equal(data, expected, err_msg=f'{layout}, {block_size}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,318 @@
+import io
+import tempfile
+import unittest
+from datetime import timedelta
+from pathlib import Path
+
+import h5py
+import numpy as np
+import pandas as pd
+import pytest
+
+from hive.convert.lvm2h5 import LVM_LAYOUTS, LVMConverter
+from hive.io.lvm import LVM_ENGINES, SegmentReader, parse_time, read_data, read_header
+from hive.io.lvmh5 import LVMH5Reader, read_lvm_h5
+
+LVM_TEXT = (
+    'LabVIEW Measurement\t\n'
+    'Writer_Version\t2\n'
+    'Reader_Version\t2\n'
+    'Separator\tTab\n'
+    'Decimal_Separator\t.\n'
+    'Multi_Headings\tNo\n'
+    'X_Columns\tOne\n'
+    'Time_Pref\tAbsolute\n'
+    'Operator\tjwhite\n'
+    'Date\t2018/09/06\n'
+    'Time\t20:40:14.6930000000000001\n'
+    '***End_of_Header***\t\n'
+    '\t\n'
+    'Channels\t2\t\t\t\n'
+    'Samples\t4\t4\t\t\n'
+    'Date\t2018/09/06\t2018/09/06\t\t\n'
+    'Time\t20:40:14.6930000000000001\t20:40:14.6935000000000001\t\t\n'
+    'Y_Unit_Label\tVolts\tVolts\t\t\n'
+    'X_Dimension\tTime\tTime\t\t\n'
+    'X0\t0.0000000000000000E+0\t0.0000000000000000E+0\t\t\n'
+    'Delta_X\t0.001000\t0.001000\t\t\n'
+    '***End_of_Header***\t\t\t\t\n'
+    'X_Value\tInput 0\tInput 1\tComment\n'
+    '0.000000\t0.1\t1.1\n'
+    '0.001000\t0.2\t1.2\n'
+    '0.002000\t0.3\t1.3\n'
+    '0.003000\t0.4\t1.4\n'
+)
+
+
+# a second segment (with data that starts with NaN, and other channel offsets),
+# for multi-segment files
+LVM_SEGMENT_TEXT = (
+    '\t\n'
+    'Channels\t2\t\t\t\n'
+    'Samples\t2\t2\t\t\n'
+    'Date\t2018/09/06\t2018/09/06\t\t\n'
+    'Time\t20:41:14.6930000000000001\t20:41:14.6950000000000001\t\t\n'
+    'Y_Unit_Label\tVolts\tVolts\t\t\n'
+    'X_Dimension\tTime\tTime\t\t\n'
+    'X0\t6.0000000000000000E+1\t6.0000000000000000E+1\t\t\n'
+    'Delta_X\t0.001000\t0.001000\t\t\n'
+    '***End_of_Header***\t\t\t\t\n'
+    'X_Value\tInput 0\tInput 1\tComment\n'
+    '60.000000\tNaN\t2.1\n'
+    '60.001000\t0.6\t2.2\n'
+)
+
+# a segment without data rows
+LVM_EMPTY_SEGMENT_TEXT = (
+    '\t\n'
+    'Channels\t2\t\t\t\n'
+    'Samples\t0\t0\t\t\n'
+    'Date\t2018/09/06\t2018/09/06\t\t\n'
+    'Time\t20:40:44.6930000000000001\t20:40:44.6930000000000001\t\t\n'
+    'Y_Unit_Label\tVolts\tVolts\t\t\n'
+    'X_Dimension\tTime\tTime\t\t\n'
+    'X0\t3.0000000000000000E+1\t3.0000000000000000E+1\t\t\n'
+    'Delta_X\t0.001000\t0.001000\t\t\n'
+    '***End_of_Header***\t\t\t\t\n'
+    'X_Value\tInput 0\tInput 1\tComment\n'
+)
+
+LVM_DTYPES = {'X_Value': 'float64', 'Input 0': 'float64', 'Input 1': 'float32'}
+
+
+class LVMHeaderTest(unittest.TestCase):
+
+    def test_read_header(self):
+        fh = io.StringIO(LVM_TEXT)
+
+        file_header = read_header(fh)
+        segment = read_header(fh)
+
+        assert file_header['Operator'] == ['jwhite']
+        assert segment['Samples'][:2] == ['4', '4']
+        assert 'Channels' in segment
+        assert fh.readline().startswith('X_Value')
+
+    def test_missing_end_of_header(self):
+        with pytest.raises(ValueError):
+            read_header(io.StringIO('LabVIEW Measurement\t\nWriter_Version\t2\n'))
+
+    def test_segment_reader(self):
+        # a small buffer makes reads start mid-line
+        fb = io.BufferedReader(io.BytesIO((LVM_TEXT + LVM_SEGMENT_TEXT).encode()), buffer_size=7)
+
+        read_header(fb)
+        read_header(fb)
+        fb.readline()
+
+        assert io.BufferedReader(SegmentReader(fb)).read().decode() == LVM_TEXT.split('Comment\n')[1]
+        assert read_header(fb)['X0'][0] == '6.0000000000000000E+1'
+        fb.readline()
+
+        assert io.BufferedReader(SegmentReader(fb)).read().decode() == LVM_SEGMENT_TEXT.split('Comment\n')[1]
+        assert read_header(fb) is None
+
+    def test_parse_time(self):
+        assert parse_time('20:40:14.6930000000000001') == timedelta(hours=20, minutes=40, seconds=14, microseconds=693000)
+        assert parse_time('01:02:03') == timedelta(hours=1, minutes=2, seconds=3)
+
+
+class LVMDataTest(unittest.TestCase):
+
+    def read_blocks(self, text, engine, block_size):
+        return list(read_data(io.BufferedReader(io.BytesIO(text.encode())), LVM_DTYPES, engine, block_size))
+
+    def test_engines(self):
+        rows = LVM_TEXT.split('Comment\n')[1]
+        expected = pd.DataFrame({
+            'X_Value': np.arange(4) * 0.001,
+            'Input 0': [0.1, 0.2, 0.3, 0.4],
+            'Input 1': np.array([1.1, 1.2, 1.3, 1.4], dtype=np.float32)
+        })
+
+        # the optional Comment field may be on some rows only (the first or a later one)
+        lines = rows.splitlines(keepends=True)
+        commented = [
+            ''.join([lines[0].replace('\n', '\tfirst row\n')] + lines[1:]),
+            ''.join(lines[:2] + [lines[2].replace('\n', '\ta "comment"\n')] + lines[3:])
+        ]
+
+        for text in [rows] + commented:
+            for engine in LVM_ENGINES:
+                for block_size in [None, 1, 3]:
+                    blocks = self.read_blocks(text, engine, block_size)
+                    pd.testing.assert_frame_equal(pd.concat(blocks, ignore_index=True), expected)
+
+    def test_empty_segment(self):
+        # every engine yields one empty (typed) block
+        for engine in LVM_ENGINES:
+            for block_size in [None, 2]:
+                blocks = self.read_blocks('', engine, block_size)
+
+                assert len(blocks) == 1, (engine, block_size)
+                assert blocks[0].shape == (0, 3)
+                assert list(blocks[0].dtypes) == [np.dtype(dt) for dt in LVM_DTYPES.values()]
+
+
+class LVMConverterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.lvm = Path(self.tmp.name) / 'test.lvm'
+        self.lvm.write_text(LVM_TEXT)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_convert(self):
+        for block_size in [None, 1, 3]:
+            converter = LVMConverter(str(self.lvm), block_size=block_size)
+            converter.process()
+
+            header = pd.read_hdf(converter.output_file, 'header')
+            assert list(header['name']) == ['Input 0', 'Input 1']
+            assert np.allclose(header['offset'], [0, 0.0005])
+
+            ch = pd.read_hdf(converter.output_file, 'data/ch001')
+            assert list(ch['frame']) == [1, 2, 3, 4]
+            assert np.allclose(ch['time'], np.arange(4) * 0.001 + 0.0005)
+            assert np.allclose(ch['Y_Value'], [1.1, 1.2, 1.3, 1.4])
+
+    def test_convert_matrix(self):
+        for kwargs in [dict(), dict(block_size=3, compress_threads=2), dict(dtype='float32')]:
+            converter = LVMConverter(str(self.lvm), layout='matrix', **kwargs)
+            converter.process()
+
+            header = pd.read_hdf(converter.output_file, 'header')
+            assert list(header['name']) == ['Input 0', 'Input 1']
+
+            with h5py.File(converter.output_file, 'r') as f:
+                assert f['data'].shape == (4, 2)
+                assert np.allclose(f['data'][:, 1], [1.1, 1.2, 1.3, 1.4])
+                np.testing.assert_array_equal(f['offset'][()], [[0, 0.0005]])
+                assert list(f['data'].attrs['channels']) == ['Input 0', 'Input 1']
+
+    def test_convert_segments(self):
+        self.lvm.write_text(LVM_TEXT + LVM_SEGMENT_TEXT)
+
+        for layout in LVM_LAYOUTS:
+            converter = LVMConverter(str(self.lvm), layout=layout, block_size=3)
+            converter.process()
+
+            segments = pd.read_hdf(converter.output_file, 'segments')
+            assert list(segments['frame']) == [0, 4]
+            assert list(segments['rows']) == [4, 2]
+            assert list(segments['X0']) == [0, 60]
+
+            text = self.lvm.read_bytes()
+            assert text[segments['data_offset'][1]:].startswith(b'60.000000')
+
+            # the channel offsets of each segment
+            np.testing.assert_array_equal(segments[['offset_ch000', 'offset_ch001']], [[0, 0.0005], [0, 0.002]])
+
+            if layout == 'matrix':
+                with h5py.File(converter.output_file, 'r') as f:
+                    np.testing.assert_array_equal(f['offset'][()], [[0, 0.0005], [0, 0.002]])
+
+            with LVMH5Reader(converter.output_file) as reader:
+                assert reader.layout == layout
+                assert reader.frame_count == 6
+
+                # every layout has the times of the tables layout: X_Value + the segment's offset
+                ch = reader.channel(1)
+                assert list(ch['frame']) == [1, 2, 3, 4, 5, 6]
+                np.testing.assert_allclose(
+                    ch['time'], [0.0005, 0.0015, 0.0025, 0.0035, 60.002, 60.003], rtol=0, atol=1e-9)
+                np.testing.assert_allclose(
+                    reader.time(0), [0.0, 0.001, 0.002, 0.003, 60.0, 60.001], rtol=0, atol=1e-9)
+                np.testing.assert_allclose(reader.time(1, 3, 5), [0.0035, 60.002], rtol=0, atol=1e-9)
+                assert np.allclose(ch['Y_Value'], [1.1, 1.2, 1.3, 1.4, 2.1, 2.2])
+
+                assert np.isnan(reader.values(0)[4])
+                assert list(reader.channel(0, 3, 5)['frame']) == [4, 5]
+
+    def test_convert_engines(self):
+        self.lvm.write_text(LVM_TEXT + LVM_EMPTY_SEGMENT_TEXT + LVM_SEGMENT_TEXT)
+
+        for engine in LVM_ENGINES:
+            for layout in LVM_LAYOUTS:
+                converter = LVMConverter(str(self.lvm), engine=engine, layout=layout, block_size=3)
+                converter.process()
+
+                with LVMH5Reader(converter.output_file) as reader:
+                    assert list(reader.segments['rows']) == [4, 0, 2]
+                    assert list(reader.segments['X0']) == [0, 30, 60]
+                    np.testing.assert_array_equal(reader.values(1), np.array([1.1, 1.2, 1.3, 1.4, 2.1, 2.2]))
+
+    def test_convert_values(self):
+        converter = LVMConverter(str(self.lvm), layout='values', dtype='float32')
+        converter.process()
+
+        # only the values are stored: the frame is the array index
+        with h5py.File(converter.output_file, 'r') as f:
+            ch = f['data/ch001']
+            assert ch.shape == (4,)
+            assert ch.dtype == np.float32
+            np.testing.assert_array_equal(ch[()], np.array([1.1, 1.2, 1.3, 1.4], dtype=np.float32))
+
+        with LVMH5Reader(converter.output_file) as reader:
+            assert reader.layout == 'values'
+            assert np.allclose(reader.time(1), np.arange(4) * 0.001 + 0.0005)
+            assert np.allclose(reader.time(1, 2), [0.0025, 0.0035])
+            np.testing.assert_array_equal(reader.values(1, 1, 3), np.array([1.2, 1.3], dtype=np.float32))
+
+    def test_read_values_tables(self):
+        # LVMConverter < 1.2 wrote the values layout as (Y_Value) tables
+        converter = LVMConverter(str(self.lvm), layout='values')
+        converter.process()
+
+        with h5py.File(converter.output_file, 'a') as f:
+            values = [f[f'data/ch{chan:03d}'][()] for chan in range(2)]
+            del f['data']
+
+        for chan, y_value in enumerate(values):
+            pd.DataFrame({'Y_Value': y_value}).to_hdf(
+                converter.output_file, key=f'data/ch{chan:03d}', mode='a', format='table')
+
+        with LVMH5Reader(converter.output_file) as reader:
+            assert reader.layout == 'values'
+            assert reader.data is None
+            np.testing.assert_array_equal(reader.matrix(), np.column_stack(values))
+            assert list(reader.channel(1)['frame']) == [1, 2, 3, 4]
+
+    def test_read_window(self):
+        self.lvm.write_text(LVM_TEXT + LVM_SEGMENT_TEXT)
+
+        # fast compression: lzf for the matrix layout
+        for layout in LVM_LAYOUTS:
+            converter = LVMConverter(str(self.lvm), layout=layout, compression='fast')
+            converter.process()
+
+            window = read_lvm_h5(converter.output_file, channels=['Input 1'], t0=0.001, t1=60.0)
+            assert list(window.columns) == ['Input 1']
+            assert np.allclose(window.index, [0.001, 0.002, 0.003, 60.0])
+            assert np.allclose(window['Input 1'], [1.2, 1.3, 1.4, 2.1])
+
+            values = read_lvm_h5(converter.output_file, channels=[1, 0], t0=59, as_array=True)
+            assert values.shape == (2, 2)
+            assert np.allclose(values[:, 0], [2.1, 2.2])
+
+            assert read_lvm_h5(converter.output_file, t0=10, t1=20).empty
+            assert len(read_lvm_h5(converter.output_file)) == 6
+
+            with pytest.raises(ValueError):
+                read_lvm_h5(converter.output_file, channels=['Input 9'])
+
+            for channel in [2, -1]:
+                with pytest.raises(ValueError):
+                    read_lvm_h5(converter.output_file, channels=[channel])
+
+            with LVMH5Reader(converter.output_file) as reader:
+                with pytest.raises(ValueError):
+                    reader.values(2)
+
+                empty = reader.matrix([], 1, 4)
+                assert empty.shape == (3, 0)
+                assert empty.dtype == reader.values(0).dtype
+
+            assert read_lvm_h5(converter.output_file, channels=[], t1=0.002).shape == (3, 0)
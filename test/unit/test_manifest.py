@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import h5py
+
+from hive.convert.base import FileConverter, fast_hash
+
+
+class CopyConverter(FileConverter):
+
+    def __init__(self, input_file, option=0):
+        self.__option = option
+        super().__init__(input_file, suffix='.h5')
+
+    @property
+    def options(self):
+        return {'option': self.__option}
+
+    def process(self):
+        with h5py.File(self.output_file, 'w') as f:
+            f['data'] = Path(self.input_file).read_bytes()
+
+        self._write_manifest()
+
+
+class ManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = Path(self.tmp.name) / 'input.dat'
+        self.file.write_bytes(b'0123456789' * 1000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fast_hash(self):
+        h = fast_hash(self.file, sample_size=100)
+        assert h == fast_hash(self.file, sample_size=100)
+
+        self.file.write_bytes(b'0123456789' * 999 + b'X123456789')
+        assert h != fast_hash(self.file, sample_size=100)
+
+    def test_missing_output(self):
+        assert not CopyConverter(str(self.file)).is_up_to_date()
+
+    def test_up_to_date(self):
+        CopyConverter(str(self.file)).process()
+        assert CopyConverter(str(self.file)).is_up_to_date()
+
+        # touched, but not changed
+        os.utime(self.file, (0, 0))
+        assert CopyConverter(str(self.file)).is_up_to_date()
+
+    def test_changed_options(self):
+        CopyConverter(str(self.file)).process()
+        assert not CopyConverter(str(self.file), option=1).is_up_to_date()
+
+    def test_changed_source(self):
+        CopyConverter(str(self.file)).process()
+        self.file.write_bytes(b'9876543210' * 1000)
+        assert not CopyConverter(str(self.file)).is_up_to_date()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from hive.scan import expand_paths, scan_files
+
+
+class ScanFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        # root/a_0.abf, root/sub/a_1.abf, root/sub/deep/a_2.abf, root/skip/a_3.abf
+        # (with increasing mtimes), and non-matching files
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+        for i, directory in enumerate(['.', 'sub', 'sub/deep', 'skip']):
+            (self.root / directory).mkdir(parents=True, exist_ok=True)
+
+            file = self.root / directory / f'a_{i}.abf'
+            file.write_bytes(b'x' * i)
+            os.utime(file, (100 - i, 100 - i) if directory == 'skip' else (i, i))
+
+            (self.root / directory / 'notes.txt').write_text('')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def names(self, scanned):
+        return [Path(f.path).name for f in scanned]
+
+    def test_flat(self):
+        scanned = scan_files(self.root, '*.abf')
+
+        assert self.names(scanned) == ['a_0.abf']
+        assert scanned[0].stat.st_size == 0
+
+    def test_recurse(self):
+        scanned = scan_files(self.root, '*.abf', recurse=True)
+
+        # oldest first, with the stat of each file
+        assert self.names(scanned) == ['a_0.abf', 'a_1.abf', 'a_2.abf', 'a_3.abf']
+        assert [f.stat.st_size for f in scanned] == [0, 1, 2, 3]
+        assert [f.stat.st_mtime for f in scanned] == [0, 1, 2, 97]
+
+    def test_prune_and_depth(self):
+        assert self.names(scan_files(self.root, '*.abf', recurse=True, prune=['sk*'])) == \
+               ['a_0.abf', 'a_1.abf', 'a_2.abf']
+        assert self.names(scan_files(self.root, '*.abf', recurse=True, prune=['sub'])) == \
+               ['a_0.abf', 'a_3.abf']
+        assert self.names(scan_files(self.root, '*.abf', recurse=True, max_depth=1)) == \
+               ['a_0.abf', 'a_1.abf', 'a_3.abf']
+        assert self.names(scan_files(self.root, '*.abf', recurse=True, max_depth=0)) == ['a_0.abf']
+
+    def test_jobs(self):
+        expected = scan_files(self.root, '*.abf', recurse=True)
+
+        for jobs in [0, 4]:
+            assert scan_files(self.root, '*.abf', recurse=True, jobs=jobs) == expected
+
+    def test_file(self):
+        file = self.root / 'notes.txt'
+        scanned = scan_files(file, '*.abf')
+
+        assert [f.path for f in scanned] == [str(file)]
+        assert scanned[0].stat == os.stat(file)
+
+    def test_expand_paths(self):
+        file = str(self.root / 'notes.txt')
+        paths = expand_paths([file, str(self.root / 'sub')], '*.abf', recurse=True)
+
+        assert [Path(p).name for p in paths] == ['notes.txt', 'a_1.abf', 'a_2.abf']
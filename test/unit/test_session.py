@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import h5py
+import numpy as np
+import pytest
+
+from hive.io.abfh5 import ABFH5Reader
+from hive.io.session import build_session_index
+
+
+class SessionIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.data = {}
+
+        # written out of time order on purpose
+        for name, start, sweeps in [('b', 1000.0, 4), ('a', 0.0, 3), ('c', 2000.0, 5)]:
+            self.data[name] = self._write(name, start, sweeps)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, start, sweeps, samples=16, channels=2):
+        data = np.random.default_rng(sweeps).normal(size=(samples, channels, sweeps))
+
+        with h5py.File(self.dir / f'{name}.h5', 'w') as f:
+            hdr = f.create_group('header')
+            hdr.attrs['sweepCount'] = sweeps
+            hdr.attrs['sweepSampleCount'] = samples
+            hdr.attrs['sampleFreq'] = 1600
+            hdr.attrs['sweepFreq'] = 10.0
+            hdr.attrs['abfTimestamp'] = 1.5e9 + start
+            hdr.attrs['recTime'] = [start, start + sweeps / 10.0]
+            hdr.attrs['si'] = 625.0
+            hdr.attrs['recChNames'] = ['FSCV_1', 'Cmd_1'][:channels]
+            f.create_dataset(name='header/sweepTimes', data=np.arange(sweeps) / 10.0)
+            f.create_dataset(name='data', data=data)
+
+        return data
+
+    def test_index(self):
+        files = [str(self.dir / f'{n}.h5') for n in 'bac']
+        index = str(self.dir / 'session.h5')
+
+        assert build_session_index(files, index) == 12
+
+        with ABFH5Reader(index) as r:
+            assert r.raw.is_virtual
+            assert list(r.header['sourceFiles']) == ['a.h5', 'b.h5', 'c.h5']
+            assert np.array_equal(
+                r.data[()],
+                np.concatenate([self.data[n] for n in 'abc'], axis=2))
+            assert np.array_equal(r.data[:, 1, 3:5], self.data['b'][:, 1, 0:2])
+            assert np.allclose(
+                r.sweep_times,
+                np.concatenate([[0.0, 0.1, 0.2], 1000 + np.arange(4) / 10, 2000 + np.arange(5) / 10]))
+            assert list(r.file['header/fileSweepStart'][()]) == [0, 3, 7]
+
+    def test_mismatch(self):
+        self._write('d', 3000.0, 2, samples=8)
+
+        with pytest.raises(ValueError):
+            build_session_index(
+                [str(self.dir / 'a.h5'), str(self.dir / 'd.h5')],
+                str(self.dir / 'session.h5'))
+
+
+if __name__ == '__main__':
+    unittest.main()